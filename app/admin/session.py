@@ -0,0 +1,22 @@
+"""Сессионная middleware только для /admin.
+
+Глобальный SessionMiddleware подписывал и разбирал cookie на каждом
+запросе, включая /health, статику и API, которым сессия не нужна.
+Эта обёртка — чистый ASGI: вне /admin запрос уходит в приложение сразу,
+без работы с cookie; внутри /admin работает обычный Starlette
+SessionMiddleware (подпись itsdangerous, set-cookie при изменении).
+"""
+from starlette.middleware.sessions import SessionMiddleware
+
+
+class AdminSessionMiddleware:
+    def __init__(self, app, secret_key: str, prefix: str = "/admin"):
+        self.app = app
+        self.prefix = prefix
+        self.session_app = SessionMiddleware(app, secret_key=secret_key)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.prefix):
+            await self.session_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
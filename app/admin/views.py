@@ -0,0 +1,118 @@
+"""SQLAdmin: аутентификация и ModelView для админ-панели.
+
+Вынесено из main.py, чтобы интроспекция колонок всех моделей выполнялась
+только когда админка действительно включена (ENABLE_ADMIN), а не при
+каждом импорте приложения каждым воркером.
+"""
+import hmac
+import logging
+
+from sqladmin import Admin, ModelView
+from sqladmin.authentication import AuthenticationBackend
+from starlette.requests import Request
+
+from app.config import settings
+from app.models.users import UserModel
+from app.models.tickets import Train, Wagon, Seat, Ticket
+from app.models.roles import RoleModel
+
+logger = logging.getLogger(__name__)
+
+
+class AdminAuth(AuthenticationBackend):
+    def __init__(self, secret_key: str) -> None:
+        super().__init__(secret_key)
+        # Учётные данные кодируются в байты один раз при создании
+        # backend'а, а не на каждую попытку входа
+        self._username = settings.ADMIN_USERNAME.encode()
+        self._password = settings.ADMIN_PASSWORD.encode()
+
+    async def login(self, request: Request) -> bool:
+        form = await request.form()
+        username = (form.get("username") or "").encode()
+        password = (form.get("password") or "").encode()
+
+        # compare_digest сравнивает за постоянное время, а битовое «&»
+        # не обрывает проверку на первом промахе — тайминг не выдаёт,
+        # какое из полей оказалось неверным
+        username_ok = hmac.compare_digest(username, self._username)
+        password_ok = hmac.compare_digest(password, self._password)
+        if username_ok & password_ok:
+            request.session.update({"admin_authenticated": True})
+            return True
+        return False
+
+    async def logout(self, request: Request) -> bool:
+        request.session.clear()
+        return True
+
+    async def authenticate(self, request: Request) -> bool:
+        return request.session.get("admin_authenticated", False)
+
+
+class UserAdmin(ModelView, model=UserModel):
+    name = "Пользователь"
+    name_plural = "Пользователи"
+    column_exclude_list = [UserModel.hashed_password]
+    page_size = 10
+    page_size_options = [10, 25, 50]
+
+
+class TrainAdmin(ModelView, model=Train):
+    name = "Поезд"
+    name_plural = "Поезда"
+    page_size = 10
+    page_size_options = [10, 25, 50]
+    can_delete = False
+
+
+class WagonAdmin(ModelView, model=Wagon):
+    name = "Вагон"
+    name_plural = "Вагоны"
+    page_size = 10
+    page_size_options = [10, 25, 50]
+
+
+class SeatAdmin(ModelView, model=Seat):
+    name = "Место"
+    name_plural = "Места"
+    page_size = 20
+    page_size_options = [10, 20, 50]
+
+
+class TicketAdmin(ModelView, model=Ticket):
+    name = "Билет"
+    name_plural = "Билеты"
+    page_size = 10
+    page_size_options = [10, 25, 50]
+    column_exclude_list = []
+
+
+class RoleAdmin(ModelView, model=RoleModel):
+    name = "Роль"
+    name_plural = "Роли"
+    page_size = 10
+    page_size_options = [10, 25, 50]
+
+
+def register_admin(app, engine) -> Admin:
+    """Смонтировать админ-панель на /admin и зарегистрировать все view"""
+    authentication_backend = AdminAuth(secret_key=settings.SESSION_SECRET)
+    admin = Admin(
+        app=app,
+        engine=engine,
+        title="Админ Панель - ВагоноМесто",
+        logo_url="https://cdn-icons-png.flaticon.com/512/4641/4641073.png",
+        authentication_backend=authentication_backend
+    )
+
+    admin.add_view(UserAdmin)
+    admin.add_view(TrainAdmin)
+    admin.add_view(WagonAdmin)
+    admin.add_view(SeatAdmin)
+    admin.add_view(TicketAdmin)
+    admin.add_view(RoleAdmin)
+
+    logger.info("✅ SQLAdmin зарегистрирован на /admin")
+    logger.info("🔐 Админ панель защищена паролем (логин: admin)")
+    return admin
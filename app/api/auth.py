@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from starlette.responses import Response
 
-from app.api.dependencies import DBDep, UserIdDep
+from app.api.dependencies import DBRoDep, DBTxDep, UserIdDep
 from app.exceptions.auth import (
     UserAlreadyExistsError,
     UserAlreadyExistsHTTPError,
@@ -19,7 +19,7 @@ router = APIRouter(prefix="/api/auth", tags=["Авторизация и ауте
 
 @router.post("/register", summary="Регистрация нового пользователя")
 async def register_user(
-    db: DBDep,
+    db: DBTxDep,
     user_data: SUserAddRequest,
 ) -> dict[str, str]:
     try:
@@ -31,7 +31,7 @@ async def register_user(
 
 @router.post("/login", summary="Аутентификация пользователя")
 async def login_user(
-    db: DBDep,
+    db: DBTxDep,
     response: Response,
     user_data: SUserAuth,
 ) -> dict[str, str]:
@@ -46,7 +46,7 @@ async def login_user(
 
 
 @router.get("/me", summary="Получение текущего пользователя для профиля")
-async def get_me(db: DBDep, user_id: UserIdDep) -> SUserGetWithRels | None:
+async def get_me(db: DBRoDep, user_id: UserIdDep) -> SUserGetWithRels | None:
     try:
         user: None | SUserGetWithRels = await AuthService(db).get_me(user_id)
     except UserNotFoundError:
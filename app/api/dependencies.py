@@ -1,5 +1,8 @@
+import hashlib
+import time
 from typing import Annotated, Tuple
 
+from cachetools import TTLCache
 from fastapi import Depends, Request, HTTPException
 from pydantic import BaseModel, Field
 
@@ -21,11 +24,16 @@ class PaginationParams(BaseModel):
 PaginationDep = Annotated[PaginationParams, Depends()]
 
 
+_BEARER_PREFIX = "Bearer "
+_BEARER_PREFIX_LEN = len(_BEARER_PREFIX)
+
+
 def get_token(request: Request) -> str:
     # Сначала пытаемся получить токен из Authorization заголовка (Bearer token)
     auth_header = request.headers.get("Authorization", None)
-    if auth_header and auth_header.startswith("Bearer "):
-        return auth_header.replace("Bearer ", "")
+    if auth_header and auth_header.startswith(_BEARER_PREFIX):
+        # Срез вместо replace: не сканируем строку второй раз
+        return auth_header[_BEARER_PREFIX_LEN:]
 
     # Если нет, пытаемся получить из cookies (для обратной совместимости)
     token = request.cookies.get("access_token", None)
@@ -36,23 +44,54 @@ def get_token(request: Request) -> str:
     raise NoAccessTokenHTTPError
 
 
-def get_current_user_id(token: str = Depends(get_token)) -> int:
+# Кэш результатов декодирования JWT: подпись проверяется один раз на токен,
+# дальше полезная нагрузка берётся из кэша. Ключ — усечённый sha256-хэш
+# (сырые токены в памяти не храним), значение — (payload, exp) или маркер ошибки.
+_DECODE_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
+_CACHED_ERROR = object()  # повторно предъявленный невалидный токен не перепроверяем
+
+
+def _cached_decode(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    cached = _DECODE_CACHE.get(key)
+    if cached is _CACHED_ERROR:
+        raise InvalidJWTTokenError
+    if cached is not None:
+        payload, exp = cached
+        # exp проверяем и после кэша: токен мог истечь внутри TTL кэша
+        if exp is None or time.time() < exp:
+            return payload
+        del _DECODE_CACHE[key]
     try:
-        data = AuthService.decode_token(token)
+        payload = AuthService.decode_token(token)
     except InvalidJWTTokenError:
-        raise InvalidTokenHTTPError
-    return data["user_id"]
+        _DECODE_CACHE[key] = _CACHED_ERROR
+        raise
+    _DECODE_CACHE[key] = (payload, payload.get("exp"))
+    return payload
 
 
 def get_current_user_data(token: str = Depends(get_token)) -> Tuple[int, str]:
-    """Возвращает (user_id, role) из токена"""
+    """Возвращает (user_id, role) из токена.
+
+    Канонический декодер: остальные зависимости строятся поверх него, и
+    благодаря кэшу зависимостей FastAPI токен декодируется один раз на запрос,
+    сколько бы из UserIdDep/UserDataDep/AdminDep ни использовал обработчик.
+    """
     try:
-        data = AuthService.decode_token(token)
+        data = _cached_decode(token)
     except InvalidJWTTokenError:
         raise InvalidTokenHTTPError
     return data["user_id"], data.get("role", "user")
 
 
+def get_current_user_id(
+    user_data: Tuple[int, str] = Depends(get_current_user_data)
+) -> int:
+    return user_data[0]
+
+
 def require_admin(user_data: Tuple[int, str] = Depends(get_current_user_data)) -> int:
     """Проверяет что пользователь - админ. Возвращает user_id."""
     user_id, role = user_data
@@ -75,3 +114,12 @@ async def get_db():
 
 
 DBDep = Annotated[DBManager, Depends(get_db)]
+
+# Транзакционные маршруты (POST/PUT/DELETE): scope по умолчанию — teardown
+# (rollback + close) завершается ДО отправки ответа, то есть клиент получает
+# 200 только после фиксации изменений
+DBTxDep = DBDep
+
+# Читающие маршруты: scope="request" откладывает закрытие сессии до момента,
+# когда ответ уже отправлен — клиент не ждёт teardown
+DBRoDep = Annotated[DBManager, Depends(get_db, scope="request")]
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.dependencies import DBDep
+from app.api.dependencies import DBRoDep, DBTxDep
 from app.exceptions.roles import (
     RoleAlreadyExistsError,
     RoleAlreadyExistsHTTPError,
@@ -17,7 +17,7 @@ router = APIRouter(prefix="/auth", tags=["Управление ролями"])
 @router.post("/roles", summary="Создание новой роли")
 async def create_new_role(
     role_data: SRoleAdd,
-    db: DBDep,
+    db: DBTxDep,
 ) -> dict[str, str]:
     try:
         await RoleService(db).create_role(role_data)
@@ -28,14 +28,14 @@ async def create_new_role(
 
 @router.get("/roles", summary="Получение списка ролей")
 async def get_all_roles(
-    db: DBDep,
+    db: DBRoDep,
 ) -> list[SRoleGet]:
     return await RoleService(db).get_roles()
 
 
 @router.get("/roles/{id}", summary="Получение конкретной роли")
 async def get_role(
-    db: DBDep,
+    db: DBRoDep,
     id: int,
 ) -> SRoleGetWithRels:
     return await RoleService(db).get_role(role_id=id)
@@ -43,7 +43,7 @@ async def get_role(
 
 @router.put("/roles/{id}", summary="Изменение конкретной роли")
 async def get_role(
-    db: DBDep,
+    db: DBTxDep,
     role_data: SRoleAdd,
     id: int,
 ) -> dict[str, str]:
@@ -57,7 +57,7 @@ async def get_role(
 
 @router.delete("/roles/{id}", summary="Удаление конкретной роли")
 async def delete_role(
-    db: DBDep,
+    db: DBTxDep,
     id: int,
 ) -> dict[str, str]:
     try:
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException, Depends, Response
 from typing import List
 from datetime import datetime
 import logging
 
-from app.database.database import get_async_session
+import orjson
+from pydantic import TypeAdapter
+
 from app.models.tickets import Train, Wagon, Seat, Ticket
 from app.api.dependencies import UserIdDep, DBDep, AdminDep
 from app.schemes.ticket_schemes import (
@@ -14,7 +15,7 @@ from app.schemes.ticket_schemes import (
     TicketCreate, TicketResponse, TicketDetailResponse,
     SearchRequest,
     PriceCalculationRequest, PriceCalculationResponse,
-    PaymentRequest, PaymentResponse, WagonTypeEnum
+    PaymentRequest, PaymentResponse, WagonTypeEnum, DiscountTypeEnum
 )
 from app.repositories.ticket_repository import (
     TrainRepository, WagonRepository, SeatRepository, TicketRepository
@@ -26,18 +27,61 @@ from app.services.ticket_service import (
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/tickets", tags=["Tickets"])
 
-# Зависимости
-async def get_train_service(session: AsyncSession = Depends(get_async_session)) -> TrainService:
-    return TrainService(TrainRepository(session))
+# Горячий путь сериализации: данные приходят из нашей же схемы БД, поэтому
+# model_construct пропускает валидацию целиком, а имена полей вычислены
+# один раз на уровне модуля.
+_WAGON_FIELDS = tuple(WagonResponse.model_fields)
+_TICKET_FIELDS = tuple(TicketResponse.model_fields)
+
+
+def _wagon_fields(wagon: Wagon) -> dict:
+    fields = {f: getattr(wagon, f) for f in _WAGON_FIELDS}
+    # wagon_type в БД хранится строкой; model_construct не приводит её
+    # к WagonTypeEnum — без коэрции каждая сериализация вагона сыпала бы
+    # PydanticSerializationUnexpectedValue в логи
+    fields["wagon_type"] = WagonTypeEnum(fields["wagon_type"])
+    return fields
+
+
+def _wagon_response(wagon: Wagon) -> WagonResponse:
+    return WagonResponse.model_construct(**_wagon_fields(wagon))
+
+
+def _ticket_response(ticket: Ticket) -> TicketResponse:
+    fields = {f: getattr(ticket, f) for f in _TICKET_FIELDS}
+    # discount_type в БД хранится строкой; model_construct не приводит её
+    # к DiscountTypeEnum, и dump_json на каждый список сыпал бы
+    # PydanticSerializationUnexpectedValue в логи
+    fields["discount_type"] = DiscountTypeEnum(fields["discount_type"])
+    return TicketResponse.model_construct(**fields)
 
-async def get_wagon_service(session: AsyncSession = Depends(get_async_session)) -> WagonService:
-    return WagonService(WagonRepository(session), SeatRepository(session))
 
-async def get_seat_service(session: AsyncSession = Depends(get_async_session)) -> SeatService:
-    return SeatService(SeatRepository(session))
+# Списочные ответы кодируются одним вызовом TypeAdapter.dump_json вместо
+# повалидации каждого элемента через response_model (возврат готового
+# Response минует сериализацию FastAPI, response_model остаётся для OpenAPI)
+_TRAIN_LIST_ADAPTER = TypeAdapter(List[TrainResponse])
+_WAGON_LIST_ADAPTER = TypeAdapter(List[WagonResponse])
+_SEAT_LIST_ADAPTER = TypeAdapter(List[SeatResponse])
+_TICKET_LIST_ADAPTER = TypeAdapter(List[TicketResponse])
 
-async def get_ticket_service(session: AsyncSession = Depends(get_async_session)) -> TicketService:
-    return TicketService(TicketRepository(session), SeatRepository(session))
+
+def _json_list(adapter: TypeAdapter, items: list) -> Response:
+    return Response(content=adapter.dump_json(items), media_type="application/json")
+
+# Зависимости. Все сервисы строятся поверх db.session из DBDep: FastAPI
+# кэширует get_db в рамках запроса, поэтому обработчик с несколькими
+# сервисами получает ОДНУ сессию вместо отдельной на каждый Depends
+async def get_train_service(db: DBDep) -> TrainService:
+    return TrainService(TrainRepository(db.session))
+
+async def get_wagon_service(db: DBDep) -> WagonService:
+    return WagonService(WagonRepository(db.session), SeatRepository(db.session))
+
+async def get_seat_service(db: DBDep) -> SeatService:
+    return SeatService(SeatRepository(db.session))
+
+async def get_ticket_service(db: DBDep) -> TicketService:
+    return TicketService(TicketRepository(db.session), SeatRepository(db.session))
 
 # ============= МАРШРУТЫ ПОЕЗДОВ =============
 
@@ -54,9 +98,7 @@ async def create_train(
 async def search_trains(
     route_from: str,
     route_to: str,
-    train_service: TrainService = Depends(get_train_service),
-    wagon_service: WagonService = Depends(get_wagon_service),
-    seat_service: SeatService = Depends(get_seat_service)
+    train_service: TrainService = Depends(get_train_service)
 ):
     """Поиск доступных поездов по маршруту"""
     # Валидация входных данных
@@ -67,19 +109,12 @@ async def search_trains(
     if len(route_from) > 100 or len(route_to) > 100:
         raise HTTPException(status_code=400, detail="Название города слишком длинное")
 
-    trains = await train_service.search_trains(route_from.strip(), route_to.strip())
+    trains = await train_service.search_trains_with_availability(
+        route_from.strip(), route_to.strip()
+    )
 
     result = []
     for train in trains:
-        wagons = await wagon_service.get_wagons_by_train(train.id)
-        wagon_responses = []
-        available_seats = 0
-
-        for wagon in wagons:
-            available = await seat_service.count_available_seats(wagon.id)
-            available_seats += available
-            wagon_responses.append(WagonResponse.model_validate(wagon))
-
         result.append(TrainScheduleResponse(
             id=train.id,
             train_number=train.train_number,
@@ -89,8 +124,9 @@ async def search_trains(
             arrival_time=train.arrival_time,
             duration_hours=train.duration_hours,
             base_price=train.base_price,
-            available_seats_count=available_seats,
-            wagons=wagon_responses
+            # Посчитано в SQL коррелированным подзапросом (column_property)
+            available_seats_count=train.available_seats_count,
+            wagons=[_wagon_response(wagon) for wagon in train.wagons]
         ))
 
     return result
@@ -101,17 +137,19 @@ async def get_train(
     service: TrainService = Depends(get_train_service)
 ):
     """Получить информацию о конкретном поезде"""
-    train = await service.get_train(train_id)
-    if not train:
+    # Горячие поезда отдаются из process-кэша без запроса к БД
+    row = await service.get_train_cached(train_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Поезд не найден")
-    return train
+    return TrainResponse.model_construct(**row)
 
 @router.get("/trains", response_model=List[TrainResponse], summary="Получить все поезда")
 async def get_all_trains(
     service: TrainService = Depends(get_train_service)
 ):
     """Получить список всех активных поездов"""
-    return await service.get_all_trains()
+    rows = await service.get_all_trains_rows()
+    return _json_list(_TRAIN_LIST_ADAPTER, [TrainResponse.model_construct(**row) for row in rows])
 
 # ============= МАРШРУТЫ ВАГОНОВ =============
 
@@ -128,6 +166,18 @@ async def create_wagon(
     await seat_service.create_seats(wagon.id, wagon.total_seats)
     return wagon
 
+@router.post("/wagons/batch", response_model=List[WagonResponse], summary="Создать вагоны пачкой")
+async def create_wagons_batch(
+    wagons_data: List[WagonCreate],
+    admin_id: AdminDep,  # Только для админов
+    wagon_service: WagonService = Depends(get_wagon_service)
+):
+    """Создать несколько вагонов с местами одной транзакцией (только для администраторов)"""
+    if not wagons_data:
+        raise HTTPException(status_code=400, detail="Пустой список вагонов")
+    wagons = await wagon_service.create_wagons_batch(wagons_data)
+    return _json_list(_WAGON_LIST_ADAPTER, [_wagon_response(wagon) for wagon in wagons])
+
 @router.get("/wagons/{wagon_id}", response_model=WagonWithSeatsResponse, summary="Получить схему вагона")
 async def get_wagon(
     wagon_id: int,
@@ -139,10 +189,10 @@ async def get_wagon(
     if not wagon:
         raise HTTPException(status_code=404, detail="Вагон не найден")
 
-    seats = await seat_service.get_wagon_layout(wagon_id)
-    return WagonWithSeatsResponse(
-        **{k: getattr(wagon, k) for k in WagonResponse.model_fields},
-        seats=[SeatResponse.model_validate(seat) for seat in seats]
+    seats = await seat_service.get_wagon_layout_rows(wagon_id)
+    return WagonWithSeatsResponse.model_construct(
+        seats=[SeatResponse.model_construct(**row) for row in seats],
+        **_wagon_fields(wagon)
     )
 
 @router.get("/trains/{train_id}/wagons", response_model=List[WagonResponse], summary="Получить вагоны поезда")
@@ -151,7 +201,8 @@ async def get_train_wagons(
     service: WagonService = Depends(get_wagon_service)
 ):
     """Получить все вагоны поезда"""
-    return await service.get_wagons_by_train(train_id)
+    wagons = await service.get_wagons_by_train(train_id)
+    return _json_list(_WAGON_LIST_ADAPTER, [_wagon_response(wagon) for wagon in wagons])
 
 @router.get("/trains/{train_id}/wagons/type/{wagon_type}", response_model=List[WagonResponse], summary="Получить вагоны по типу")
 async def get_wagons_by_type(
@@ -160,10 +211,10 @@ async def get_wagons_by_type(
     service: WagonService = Depends(get_wagon_service)
 ):
     """Получить вагоны конкретного типа (platzkart, coupe, suite)"""
-    wagons = await service.get_wagons_by_type(train_id, wagon_type.value)
+    wagons = await service.get_wagons_by_type(train_id, wagon_type)
     if not wagons:
         raise HTTPException(status_code=404, detail="Вагоны не найдены")
-    return wagons
+    return _json_list(_WAGON_LIST_ADAPTER, [_wagon_response(wagon) for wagon in wagons])
 
 # ============= МАРШРУТЫ МЕСТ =============
 
@@ -173,10 +224,10 @@ async def get_wagon_layout(
     service: SeatService = Depends(get_seat_service)
 ):
     """Получить визуальную схему всех мест в вагоне"""
-    seats = await service.get_wagon_layout(wagon_id)
+    seats = await service.get_wagon_layout_rows(wagon_id)
     if not seats:
         raise HTTPException(status_code=404, detail="Вагон не найден или нет мест")
-    return [SeatResponse.model_validate(seat) for seat in seats]
+    return _json_list(_SEAT_LIST_ADAPTER, [SeatResponse.model_construct(**row) for row in seats])
 
 @router.get("/wagons/{wagon_id}/available", response_model=List[SeatResponse], summary="Свободные места")
 async def get_available_seats(
@@ -184,66 +235,62 @@ async def get_available_seats(
     service: SeatService = Depends(get_seat_service)
 ):
     """Получить список свободных мест в вагоне"""
-    seats = await service.get_available_seats(wagon_id)
-    return [SeatResponse.model_validate(seat) for seat in seats]
+    seats = await service.get_available_seats_rows(wagon_id)
+    return _json_list(_SEAT_LIST_ADAPTER, [SeatResponse.model_construct(**row) for row in seats])
 
 # ============= МАРШРУТЫ РАСЧЕТА ЦЕНЫ И СКИДОК =============
 
 @router.post("/calculate-price", response_model=PriceCalculationResponse, summary="Расчет стоимости билета")
 async def calculate_price(
     request: PriceCalculationRequest,
-    train_service: TrainService = Depends(get_train_service),
-    wagon_service: WagonService = Depends(get_wagon_service),
     ticket_service: TicketService = Depends(get_ticket_service)
 ):
     """Рассчитать стоимость билета с учетом скидок"""
-    train = await train_service.get_train(request.train_id)
+    # Поезд, вагон и место — один запрос вместо трёх последовательных
+    train, wagon, _ = await ticket_service.get_booking_context(
+        request.train_id, request.wagon_id, request.seat_id
+    )
     if not train:
         raise HTTPException(status_code=404, detail="Поезд не найден")
-
-    wagon = await wagon_service.get_wagon(request.wagon_id)
     if not wagon:
         raise HTTPException(status_code=404, detail="Вагон не найден")
 
-    return await ticket_service.calculate_price(train, wagon, request.discount_type.value)
+    return await ticket_service.calculate_price(train, wagon, request.discount_type)
+
+# Состав скидок фиксирован, поэтому ответ кодируется в JSON один раз
+# при импорте модуля — без jsonable_encoder и сериализации на каждый запрос
+_DISCOUNTS_JSON = orjson.dumps({
+    "discounts": [
+        {"type": "child", "description": "Детская скидка (0-12 лет)", "percent": 50},
+        {"type": "student", "description": "Студенческая скидка", "percent": 25},
+        {"type": "pensioner", "description": "Пенсионная скидка", "percent": 40},
+        {"type": "none", "description": "Без скидки", "percent": 0}
+    ]
+})
+
 
 @router.get("/discounts", summary="Информация о скидках")
 async def get_discounts():
     """Получить информацию о доступных скидках"""
-    return {
-        "discounts": [
-            {"type": "child", "description": "Детская скидка (0-12 лет)", "percent": 50},
-            {"type": "student", "description": "Студенческая скидка", "percent": 25},
-            {"type": "pensioner", "description": "Пенсионная скидка", "percent": 40},
-            {"type": "none", "description": "Без скидки", "percent": 0}
-        ]
-    }
+    return Response(content=_DISCOUNTS_JSON, media_type="application/json")
 
 # ============= МАРШРУТЫ БИЛЕТОВ =============
 
 @router.get("/my-tickets", response_model=List[TicketResponse], summary="Мои билеты")
 async def get_my_tickets(
     user_id: UserIdDep,
-    db: DBDep,
     service: TicketService = Depends(get_ticket_service)
 ):
     """Получить все билеты текущего пользователя"""
-    # Получаем email пользователя по user_id
-    user = await db.users.get_one_or_none(id=user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    tickets = await service.get_user_tickets(user.email)
-    return tickets
+    # Выборка по owner_id: таблица users не затрагивается вовсе
+    tickets = await service.get_tickets_by_owner(user_id)
+    return _json_list(_TICKET_LIST_ADAPTER, [_ticket_response(ticket) for ticket in tickets])
 
 @router.post("/create", response_model=TicketResponse, summary="Создать и забронировать билет")
 async def create_ticket(
     ticket_data: TicketCreate,
     user_id: UserIdDep,
     db: DBDep,
-    train_service: TrainService = Depends(get_train_service),
-    wagon_service: WagonService = Depends(get_wagon_service),
-    seat_service: SeatService = Depends(get_seat_service),
     ticket_service: TicketService = Depends(get_ticket_service)
 ):
     """Создать новый билет и зарезервировать место"""
@@ -259,45 +306,40 @@ async def create_ticket(
             detail="Вы можете создавать билеты только на свой email"
         )
 
-    # Проверить поезд
-    train = await train_service.get_train(ticket_data.train_id)
+    # Поезд, вагон и место проверяем одним запросом вместо трёх
+    train, wagon, seat = await ticket_service.get_booking_context(
+        ticket_data.train_id, ticket_data.wagon_id, ticket_data.seat_id
+    )
     if not train:
         raise HTTPException(status_code=404, detail="Поезд не найден")
-
-    # Проверить вагон
-    wagon = await wagon_service.get_wagon(ticket_data.wagon_id)
     if not wagon:
         raise HTTPException(status_code=404, detail="Вагон не найден")
-
-    # Атомарная проверка и резервирование места (исправление race condition)
-    seat_reserved = await seat_service.try_reserve_seat(ticket_data.seat_id)
-    if not seat_reserved:
+    if not seat:
         raise HTTPException(status_code=400, detail="Место недоступно для бронирования")
 
-    try:
-        # Рассчитать цену
-        price_calc = await ticket_service.calculate_price(train, wagon, ticket_data.discount_type.value)
-
-        # Создать билет
-        ticket = await ticket_service.create_ticket(
-            ticket_data,
-            price_calc.base_price,
-            price_calc.final_price,
-            train
-        )
+    # Рассчитать цену
+    price_calc = await ticket_service.calculate_price(train, wagon, ticket_data.discount_type)
+
+    # Резервирование места и создание билета — одна транзакция: либо
+    # оба изменения фиксируются вместе, либо откатываются, поэтому
+    # компенсирующий release_seat больше не нужен
+    ticket = await ticket_service.reserve_and_create_ticket(
+        ticket_data,
+        price_calc.base_price,
+        price_calc.final_price,
+        price_calc.discount_percent,
+        train,
+        owner_id=user_id
+    )
+    if ticket is None:
+        raise HTTPException(status_code=400, detail="Место недоступно для бронирования")
 
-        return TicketResponse.model_validate(ticket)
-    except Exception as e:
-        # Если что-то пошло не так - освобождаем место
-        await seat_service.release_seat(ticket_data.seat_id)
-        logger.error(f"Ошибка создания билета: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка при создании билета")
+    return TicketResponse.model_validate(ticket)
 
 @router.get("/ticket/{ticket_id}", response_model=TicketResponse, summary="Получить информацию о билете")
 async def get_ticket(
     ticket_id: int,
     user_id: UserIdDep,
-    db: DBDep,
     service: TicketService = Depends(get_ticket_service)
 ):
     """Получить информацию о конкретном билете (только свои билеты)"""
@@ -305,9 +347,8 @@ async def get_ticket(
     if not ticket:
         raise HTTPException(status_code=404, detail="Билет не найден")
 
-    # Проверяем владельца билета
-    user = await db.users.get_one_or_none(id=user_id)
-    if not user or ticket.passenger_email != user.email:
+    # Проверяем владельца по owner_id прямо на строке билета
+    if ticket.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Доступ к билету запрещён")
 
     return ticket
@@ -316,22 +357,20 @@ async def get_ticket(
 async def get_user_tickets(
     passenger_email: str,
     user_id: UserIdDep,
-    db: DBDep,
     service: TicketService = Depends(get_ticket_service)
 ):
     """Получить все билеты пассажира (только свои билеты)"""
-    # Проверяем, что пользователь запрашивает свои билеты
-    user = await db.users.get_one_or_none(id=user_id)
-    if not user or user.email != passenger_email:
+    # Проверка владельца и выборка билетов — один запрос
+    user_email, tickets = await service.get_user_tickets_with_owner(user_id)
+    if user_email is None or user_email != passenger_email:
         raise HTTPException(status_code=403, detail="Вы можете просматривать только свои билеты")
 
-    return await service.get_user_tickets(passenger_email)
+    return _json_list(_TICKET_LIST_ADAPTER, [_ticket_response(ticket) for ticket in tickets])
 
 @router.delete("/delete/{ticket_id}", summary="Удалить билет")
 async def delete_ticket(
     ticket_id: int,
     user_id: UserIdDep,
-    db: DBDep,
     seat_service: SeatService = Depends(get_seat_service),
     ticket_service: TicketService = Depends(get_ticket_service)
 ):
@@ -340,9 +379,8 @@ async def delete_ticket(
     if not ticket:
         raise HTTPException(status_code=404, detail="Билет не найден")
 
-    # Проверяем владельца билета
-    user = await db.users.get_one_or_none(id=user_id)
-    if not user or ticket.passenger_email != user.email:
+    # Проверяем владельца по owner_id прямо на строке билета
+    if ticket.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Вы можете удалять только свои билеты")
 
     # Освободить место
@@ -357,7 +395,6 @@ async def delete_ticket(
 async def pay_ticket(
     payment: PaymentRequest,
     user_id: UserIdDep,
-    db: DBDep,
     service: TicketService = Depends(get_ticket_service)
 ):
     """Оплатить билет (только свои билеты)"""
@@ -365,9 +402,8 @@ async def pay_ticket(
     if not ticket:
         raise HTTPException(status_code=404, detail="Билет не найден")
 
-    # Проверяем владельца билета
-    user = await db.users.get_one_or_none(id=user_id)
-    if not user or ticket.passenger_email != user.email:
+    # Проверяем владельца по owner_id прямо на строке билета
+    if ticket.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Вы можете оплачивать только свои билеты")
 
     ticket = await service.pay_ticket(payment.ticket_id)
@@ -377,24 +413,18 @@ async def pay_ticket(
 async def get_ticket_pdf(
     ticket_id: int,
     user_id: UserIdDep,
-    db: DBDep,
-    train_service: TrainService = Depends(get_train_service),
-    wagon_service: WagonService = Depends(get_wagon_service),
-    seat_service: SeatService = Depends(get_seat_service),
     ticket_service: TicketService = Depends(get_ticket_service)
 ):
     """Получить данные для электронного билета в формате JSON (только свои билеты)"""
-    ticket = await ticket_service.get_ticket(ticket_id)
+    # Билет вместе с поездом/вагоном/местом — один вызов
+    ticket = await ticket_service.get_ticket(ticket_id, with_relations=True)
     if not ticket:
         raise HTTPException(status_code=404, detail="Билет не найден")
 
-    # Проверяем владельца билета
-    user = await db.users.get_one_or_none(id=user_id)
-    if not user or ticket.passenger_email != user.email:
+    # Проверяем владельца по owner_id прямо на строке билета
+    if ticket.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Вы можете скачивать только свои билеты")
 
-    train = await train_service.get_train(ticket.train_id)
-    wagon = await wagon_service.get_wagon(ticket.wagon_id)
-    seat = await seat_service.get_seat(ticket.seat_id)
-
-    return await ticket_service.generate_pdf_ticket(ticket, train, wagon, seat)
+    return await ticket_service.generate_pdf_ticket(
+        ticket, ticket.train, ticket.wagon, ticket.seat
+    )
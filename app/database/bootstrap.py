@@ -0,0 +1,76 @@
+"""Одноразовая инициализация схемы и справочных данных.
+
+Раньше create_all и посев ролей жили прямо в lifespan: при запуске с
+workers=N каждый процесс заново сканировал каталог БД, компилировал DDL
+и вычитывал все роли в память. Теперь инициализацию выполняет один
+процесс — остальные дожидаются его на файловой блокировке и проходят
+startup без обращений к схеме.
+"""
+import fcntl
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database.database import Base, engine, async_session_maker
+
+logger = logging.getLogger(__name__)
+
+# Блокировка общая для всех воркеров на машине (spawn uvicorn'а не даёт
+# другого разделяемого состояния до старта приложения)
+_LOCK_FILE = Path("/tmp/wagono_mesto.init.lock")
+
+_DEFAULT_ROLE_NAMES = {1: "user", 2: "admin", 3: "moderator"}
+
+
+async def _init_once() -> None:
+    if settings.AUTO_CREATE_TABLES:
+        logger.info("🚀 Создание таблиц базы данных...")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        logger.info("✅ Таблицы успешно созданы")
+
+    # Роли по умолчанию: конфликт по id гасится на стороне БД — не нужно
+    # вычитывать существующие строки, чтобы понять, сеять или нет.
+    # created_at/updated_at указываются явно: питоновские default'ы Base
+    # в сыром SQL не срабатывают, а без них OR IGNORE молча отбросит
+    # строки по NOT NULL
+    if engine.dialect.name == "sqlite":
+        stmt = (
+            "INSERT OR IGNORE INTO roles (id, name, created_at, updated_at) "
+            "VALUES (:id, :name, :now, :now)"
+        )
+    else:
+        stmt = (
+            "INSERT INTO roles (id, name, created_at, updated_at) "
+            "VALUES (:id, :name, :now, :now) ON CONFLICT DO NOTHING"
+        )
+    now = datetime.utcnow()
+    rows = [
+        {"id": role_id, "name": name, "now": now}
+        for role_id, name in _DEFAULT_ROLE_NAMES.items()
+    ]
+    async with async_session_maker() as session:
+        await session.execute(text(stmt), rows)
+        await session.commit()
+
+
+async def ensure_schema() -> None:
+    """Создать таблицы и роли по умолчанию ровно один раз на хост.
+
+    Первый воркер берёт эксклюзивную блокировку и выполняет DDL с посевом;
+    остальные блокируются до его завершения и выходят, не трогая схему.
+    Сама инициализация идемпотентна (checkfirst у create_all, OR IGNORE у
+    ролей), поэтому повторный прогон после рестарта безопасен.
+    """
+    _LOCK_FILE.touch(exist_ok=True)
+    with _LOCK_FILE.open() as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Инициализацию уже делает другой воркер — ждём и выходим
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            return
+        await _init_once()
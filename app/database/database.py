@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import AsyncGenerator
 
-from sqlalchemy import NullPool, func, text
+from sqlalchemy import AsyncAdaptedQueuePool, NullPool, event, func, text
 from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
@@ -11,9 +11,48 @@ from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from app.config import settings
 
-engine = create_async_engine(settings.get_db_url)
+_db_url = settings.get_db_url
 
-engine_null_pool = create_async_engine(settings.get_db_url, poolclass=NullPool)
+# Пул прогретых соединений: без него каждый запрос платит за открытие
+# нового соединения, а под нагрузкой возможны таймауты на чекауте.
+# LIFO-выдача отдаёт самое «тёплое» соединение, recycle страхует от
+# молчаливо протухших. Для :memory: пул не настраиваем
+_engine_kwargs: dict = {}
+if ":memory:" not in _db_url:
+    _engine_kwargs = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_use_lifo": True,
+        "pool_recycle": 1800,
+    }
+if _db_url.startswith("postgresql+asyncpg"):
+    # Кэш подготовленных запросов asyncpg: повторяющиеся SELECT/UPDATE
+    # не парсятся на сервере заново
+    _engine_kwargs["connect_args"] = {"statement_cache_size": 1024}
+
+engine = create_async_engine(_db_url, **_engine_kwargs)
+
+engine_null_pool = create_async_engine(_db_url, poolclass=NullPool)
+
+
+def _apply_sqlite_pragmas(async_engine) -> None:
+    """WAL-журнал для SQLite: читатели не блокируют писателя и наоборот,
+    synchronous=NORMAL убирает fsync на каждый COMMIT. Временная мера
+    для разработки — прод ходит в постгрес через DB_URL."""
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_conn, _connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+if _db_url.startswith("sqlite"):
+    _apply_sqlite_pragmas(engine)
+    _apply_sqlite_pragmas(engine_null_pool)
 
 
 async_session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
@@ -32,6 +71,8 @@ class Base(DeclarativeBase):
 # Импортируем модели для регистрации в Base.metadata
 # Это ВАЖНО для создания таблиц через Base.metadata.create_all()
 from app.models.tickets import Train, Wagon, Seat, Ticket  # noqa: E402, F401
+from app.models.users import UserModel  # noqa: E402, F401
+from app.models.roles import RoleModel  # noqa: E402, F401
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
-from sqlalchemy import String, Float, DateTime, Boolean, Enum, ForeignKey, Integer
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Float, DateTime, Boolean, Enum, ForeignKey, Index, Integer, select, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship, column_property
 from app.database.database import Base
 from datetime import datetime
 import enum
@@ -21,11 +21,16 @@ class DiscountType(str, enum.Enum):
 
 class Train(Base):
     __tablename__ = "trains"
-    
+
+    # Составной индекс под горячий фильтр поиска: route_from AND route_to AND is_active
+    __table_args__ = (
+        Index("ix_trains_route_active", "route_from", "route_to", "is_active"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     train_number: Mapped[str] = mapped_column(String(50), unique=True, index=True)
-    route_from: Mapped[str] = mapped_column(String(100), index=True)
-    route_to: Mapped[str] = mapped_column(String(100), index=True)
+    route_from: Mapped[str] = mapped_column(String(100))
+    route_to: Mapped[str] = mapped_column(String(100))
     departure_time: Mapped[datetime] = mapped_column(DateTime)
     arrival_time: Mapped[datetime] = mapped_column(DateTime)
     duration_hours: Mapped[int] = mapped_column(Integer)
@@ -53,7 +58,14 @@ class Wagon(Base):
 
 class Seat(Base):
     __tablename__ = "seats"
-    
+
+    # Покрывающий индекс под выборку свободных мест: фильтр
+    # wagon_id AND is_available AND is_reserved + сортировка по seat_number
+    # обслуживаются одним индексом без обращения к таблице
+    __table_args__ = (
+        Index("ix_seats_wagon_avail", "wagon_id", "is_available", "is_reserved", "seat_number"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     wagon_id: Mapped[int] = mapped_column(ForeignKey("wagons.id"), index=True)
     seat_number: Mapped[int] = mapped_column(Integer)
@@ -66,11 +78,21 @@ class Seat(Base):
 
 class Ticket(Base):
     __tablename__ = "tickets"
-    
+
+    # Индекс под выборку билетов пассажира: фильтр по email
+    # + ORDER BY created_at DESC из того же индекса
+    __table_args__ = (
+        Index("ix_tickets_email_created", "passenger_email", "created_at"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     train_id: Mapped[int] = mapped_column(ForeignKey("trains.id"), index=True)
     wagon_id: Mapped[int] = mapped_column(ForeignKey("wagons.id"), index=True)
     seat_id: Mapped[int] = mapped_column(ForeignKey("seats.id"), index=True)
+    # Владелец билета: прямая ссылка на пользователя, чтобы проверка
+    # «свой билет» была предикатом по самой строке билета без похода в users.
+    # Nullable ради старых строк — их заполняет бэкфилл в миграции
+    owner_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), index=True, nullable=True)
     passenger_name: Mapped[str] = mapped_column(String(200))
     passenger_email: Mapped[str] = mapped_column(String(200))
     passenger_phone: Mapped[str] = mapped_column(String(20))
@@ -87,3 +109,20 @@ class Ticket(Base):
     train: Mapped["Train"] = relationship(back_populates="tickets")
     wagon: Mapped["Wagon"] = relationship(back_populates="tickets")
     seat: Mapped["Seat"] = relationship(back_populates="tickets")
+
+# Количество свободных мест поезда как коррелированный подзапрос.
+# Объявляется после Seat/Wagon (они нужны в выражении) и deferred,
+# чтобы обычные выборки поездов не платили за подзапрос; поиск
+# включает его явно через undefer(Train.available_seats_count)
+Train.available_seats_count = column_property(
+    select(func.count(Seat.id))
+    .join(Wagon, Seat.wagon_id == Wagon.id)
+    .where(
+        Wagon.train_id == Train.id,
+        Seat.is_available == True,
+        Seat.is_reserved == False,
+    )
+    .correlate_except(Seat, Wagon)
+    .scalar_subquery(),
+    deferred=True,
+)
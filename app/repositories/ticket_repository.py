@@ -1,25 +1,39 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, delete
+from sqlalchemy import bindparam, select, and_, or_, delete, func, insert, literal, update
+from sqlalchemy.orm import selectinload, undefer
 from datetime import datetime, date
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from app.models.tickets import Train, Wagon, Seat, Ticket
+from app.models.users import UserModel
+
+# Шаблоны точечных выборок: statement строится один раз при импорте,
+# в рантайме подставляются только bind-параметры — на мелких lookup'ах
+# конструирование запроса стоит дороже самого выполнения
+_TRAIN_BY_ID = select(Train).where(Train.id == bindparam("train_id"))
+_TRAIN_BY_NUMBER = select(Train).where(Train.train_number == bindparam("train_number"))
+_WAGON_BY_ID = select(Wagon).where(Wagon.id == bindparam("wagon_id"))
+_SEAT_BY_ID = select(Seat).where(Seat.id == bindparam("seat_id"))
+_TICKET_BY_ID = select(Ticket).where(Ticket.id == bindparam("ticket_id"))
+_TICKET_BY_NUMBER = select(Ticket).where(Ticket.ticket_number == bindparam("ticket_number"))
+
 
 class TrainRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
     
     async def create_train(self, train: Train) -> Train:
+        # refresh не нужен: expire_on_commit=False, id проставляется при
+        # flush, а created_at/updated_at — питоновские default'ы
         self.session.add(train)
         await self.session.commit()
-        await self.session.refresh(train)
         return train
     
     async def get_train(self, train_id: int) -> Optional[Train]:
-        result = await self.session.execute(select(Train).where(Train.id == train_id))
+        result = await self.session.execute(_TRAIN_BY_ID, {"train_id": train_id})
         return result.scalar_one_or_none()
-    
+
     async def get_train_by_number(self, train_number: str) -> Optional[Train]:
-        result = await self.session.execute(select(Train).where(Train.train_number == train_number))
+        result = await self.session.execute(_TRAIN_BY_NUMBER, {"train_number": train_number})
         return result.scalar_one_or_none()
     
     async def search_trains(self, route_from: str, route_to: str) -> List[Train]:
@@ -37,6 +51,59 @@ class TrainRepository:
         result = await self.session.execute(select(Train))
         return result.scalars().all()
 
+    async def get_train_row(self, train_id: int) -> Optional[dict]:
+        """Поезд как Core-маппинг — простые значения, живущие дольше сессии"""
+        result = await self.session.execute(
+            self._train_columns().where(Train.id == train_id)
+        )
+        return result.mappings().one_or_none()
+
+    async def get_all_trains_rows(self) -> List[dict]:
+        """Все поезда как Core-маппинги без ORM-гидрации.
+
+        Обработчику нужен только фиксированный набор полей, поэтому
+        identity map и инструментирование атрибутов — лишняя работа.
+        """
+        result = await self.session.execute(self._train_columns())
+        return result.mappings().all()
+
+    @staticmethod
+    def _train_columns():
+        return select(
+            Train.id,
+            Train.train_number,
+            Train.route_from,
+            Train.route_to,
+            Train.departure_time,
+            Train.arrival_time,
+            Train.duration_hours,
+            Train.base_price,
+            Train.is_active,
+            Train.created_at,
+        )
+
+    async def search_with_availability(self, route_from: str, route_to: str) -> List[Train]:
+        """Поиск поездов с вагонами и числом свободных мест.
+
+        Счётчик мест — deferred column_property на Train: undefer включает
+        коррелированный подзапрос прямо в SELECT поездов, агрегация в
+        Python не нужна. Вагоны догружаются одним selectinload.
+        """
+        result = await self.session.execute(
+            select(Train)
+            .options(
+                selectinload(Train.wagons),
+                undefer(Train.available_seats_count),
+            )
+            .where(
+                and_(
+                    Train.route_from == route_from,
+                    Train.route_to == route_to
+                )
+            )
+        )
+        return result.scalars().all()
+
 class WagonRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -44,11 +111,29 @@ class WagonRepository:
     async def create_wagon(self, wagon: Wagon) -> Wagon:
         self.session.add(wagon)
         await self.session.commit()
-        await self.session.refresh(wagon)
         return wagon
+
+    async def create_wagons_with_seats(self, wagons: List[Wagon]) -> List[Wagon]:
+        """Создать пачку вагонов вместе с их местами одной транзакцией.
+
+        add_all + один flush даёт id вагонов, места всех вагонов уходят
+        одним многострочным INSERT — один commit на всю пачку вместо
+        транзакции на каждый вагон и каждое место.
+        """
+        self.session.add_all(wagons)
+        await self.session.flush()
+        await self.session.execute(
+            insert(Seat).values([
+                {"wagon_id": wagon.id, "seat_number": seat_number}
+                for wagon in wagons
+                for seat_number in range(1, wagon.total_seats + 1)
+            ])
+        )
+        await self.session.commit()
+        return wagons
     
     async def get_wagon(self, wagon_id: int) -> Optional[Wagon]:
-        result = await self.session.execute(select(Wagon).where(Wagon.id == wagon_id))
+        result = await self.session.execute(_WAGON_BY_ID, {"wagon_id": wagon_id})
         return result.scalar_one_or_none()
     
     async def get_wagons_by_train(self, train_id: int) -> List[Wagon]:
@@ -73,11 +158,24 @@ class SeatRepository:
     async def create_seat(self, seat: Seat) -> Seat:
         self.session.add(seat)
         await self.session.commit()
-        await self.session.refresh(seat)
         return seat
     
+    async def create_seats_bulk(self, wagon_id: int, total_seats: int) -> None:
+        """Создать все места вагона одним INSERT.
+
+        Вместо add + commit + refresh на каждое место (до 54 транзакций
+        на вагон) — один многострочный INSERT и один commit.
+        """
+        await self.session.execute(
+            insert(Seat).values([
+                {"wagon_id": wagon_id, "seat_number": seat_number}
+                for seat_number in range(1, total_seats + 1)
+            ])
+        )
+        await self.session.commit()
+
     async def get_seat(self, seat_id: int) -> Optional[Seat]:
-        result = await self.session.execute(select(Seat).where(Seat.id == seat_id))
+        result = await self.session.execute(_SEAT_BY_ID, {"seat_id": seat_id})
         return result.scalar_one_or_none()
     
     async def get_available_seats(self, wagon_id: int) -> List[Seat]:
@@ -92,58 +190,107 @@ class SeatRepository:
         )
         return result.scalars().all()
     
+    async def count_available(self, wagon_id: int) -> int:
+        """Число свободных мест одним COUNT(*) — без гидрации строк"""
+        result = await self.session.execute(
+            select(func.count())
+            .select_from(Seat)
+            .where(
+                and_(
+                    Seat.wagon_id == wagon_id,
+                    Seat.is_available == True,
+                    Seat.is_reserved == False
+                )
+            )
+        )
+        return result.scalar_one()
+
     async def get_all_seats(self, wagon_id: int) -> List[Seat]:
         result = await self.session.execute(
             select(Seat).where(Seat.wagon_id == wagon_id).order_by(Seat.seat_number)
         )
         return result.scalars().all()
+
+    async def get_all_seats_rows(self, wagon_id: int) -> List[dict]:
+        """Схема мест вагона как Core-маппинги без ORM-гидрации"""
+        result = await self.session.execute(
+            self._seat_columns()
+            .where(Seat.wagon_id == wagon_id)
+            .order_by(Seat.seat_number)
+        )
+        return result.mappings().all()
+
+    async def get_available_seats_rows(self, wagon_id: int) -> List[dict]:
+        """Свободные места вагона как Core-маппинги без ORM-гидрации"""
+        result = await self.session.execute(
+            self._seat_columns()
+            .where(
+                and_(
+                    Seat.wagon_id == wagon_id,
+                    Seat.is_available == True,
+                    Seat.is_reserved == False
+                )
+            )
+            .order_by(Seat.seat_number)
+        )
+        return result.mappings().all()
+
+    @staticmethod
+    def _seat_columns():
+        return select(
+            Seat.id,
+            Seat.wagon_id,
+            Seat.seat_number,
+            Seat.is_available,
+            Seat.is_reserved,
+            Seat.created_at,
+        )
     
-    async def update_seat_availability(self, seat_id: int, is_available: bool) -> Seat:
-        seat = await self.get_seat(seat_id)
-        if seat:
-            seat.is_available = is_available
-            await self.session.commit()
-            await self.session.refresh(seat)
-        return seat
-    
-    async def reserve_seat(self, seat_id: int) -> Seat:
-        seat = await self.get_seat(seat_id)
-        if seat:
-            seat.is_reserved = True
-            seat.is_available = False
-            await self.session.commit()
-            await self.session.refresh(seat)
+    async def _update_seat_returning(self, seat_id: int, **values) -> Optional[Seat]:
+        """Один UPDATE ... RETURNING вместо SELECT + commit + refresh.
+
+        Возвращает обновлённое место или None, если seat_id не существует.
+        """
+        result = await self.session.execute(
+            update(Seat)
+            .where(Seat.id == seat_id)
+            .values(**values)
+            .returning(Seat)
+        )
+        seat = result.scalar_one_or_none()
+        await self.session.commit()
         return seat
-    
-    async def release_seat(self, seat_id: int) -> Seat:
+
+    async def update_seat_availability(self, seat_id: int, is_available: bool) -> Optional[Seat]:
+        return await self._update_seat_returning(seat_id, is_available=is_available)
+
+    async def reserve_seat(self, seat_id: int) -> Optional[Seat]:
+        return await self._update_seat_returning(seat_id, is_reserved=True, is_available=False)
+
+    async def release_seat(self, seat_id: int) -> Optional[Seat]:
         """Освободить место (отменить резервацию)"""
-        seat = await self.get_seat(seat_id)
-        if seat:
-            seat.is_reserved = False
-            seat.is_available = True
-            await self.session.commit()
-            await self.session.refresh(seat)
-        return seat
+        return await self._update_seat_returning(seat_id, is_reserved=False, is_available=True)
 
     async def try_reserve_seat(self, seat_id: int) -> bool:
-        """Атомарная попытка забронировать место (защита от race condition)"""
+        """Атомарная попытка забронировать место (защита от race condition).
+
+        Один условный UPDATE ... RETURNING вместо SELECT FOR UPDATE +
+        UPDATE: атомарно на любом бэкенде (FOR UPDATE в SQLite — no-op),
+        ноль затронутых строк означает «место уже занято».
+        """
         try:
-            # Используем SELECT FOR UPDATE для блокировки строки
             result = await self.session.execute(
-                select(Seat)
-                .where(Seat.id == seat_id)
-                .with_for_update()
+                update(Seat)
+                .where(
+                    Seat.id == seat_id,
+                    Seat.is_available == True,
+                    Seat.is_reserved == False
+                )
+                .values(is_reserved=True, is_available=False)
+                .returning(Seat.id)
             )
-            seat = result.scalar_one_or_none()
-
-            if not seat or not seat.is_available or seat.is_reserved:
-                return False
-
-            # Бронируем место
-            seat.is_reserved = True
-            seat.is_available = False
             await self.session.commit()
-            return True
+            return result.scalar_one_or_none() is not None
         except Exception:
             await self.session.rollback()
             return False
@@ -155,17 +302,108 @@ class TicketRepository:
     async def create_ticket(self, ticket: Ticket) -> Ticket:
         self.session.add(ticket)
         await self.session.commit()
-        await self.session.refresh(ticket)
         return ticket
     
-    async def get_ticket(self, ticket_id: int) -> Optional[Ticket]:
-        result = await self.session.execute(select(Ticket).where(Ticket.id == ticket_id))
+    async def reserve_and_create(self, ticket: Ticket) -> Optional[Ticket]:
+        """Атомарно зарезервировать место и создать билет в одной транзакции.
+
+        Условный UPDATE бронирует место только если оно ещё свободно; если
+        ни одна строка не изменилась — место занято, возвращается None.
+        INSERT билета попадает в ту же транзакцию, поэтому окна «место
+        зарезервировано, а билета нет» не существует: при любой ошибке
+        откатываются оба изменения.
+        """
+        reserved = await self.session.execute(
+            update(Seat)
+            .where(
+                Seat.id == ticket.seat_id,
+                Seat.is_available == True,
+                Seat.is_reserved == False
+            )
+            .values(is_reserved=True, is_available=False)
+        )
+        if reserved.rowcount == 0:
+            await self.session.rollback()
+            return None
+
+        self.session.add(ticket)
+        await self.session.commit()
+        return ticket
+
+    async def get_ticket(self, ticket_id: int, with_relations: bool = False) -> Optional[Ticket]:
+        query = _TICKET_BY_ID
+        if with_relations:
+            query = query.options(
+                selectinload(Ticket.train),
+                selectinload(Ticket.wagon),
+                selectinload(Ticket.seat),
+            )
+        result = await self.session.execute(query, {"ticket_id": ticket_id})
         return result.scalar_one_or_none()
-    
+
     async def get_ticket_by_number(self, ticket_number: str) -> Optional[Ticket]:
-        result = await self.session.execute(select(Ticket).where(Ticket.ticket_number == ticket_number))
+        result = await self.session.execute(_TICKET_BY_NUMBER, {"ticket_number": ticket_number})
         return result.scalar_one_or_none()
     
+    async def get_train_wagon_seat(
+        self, train_id: int, wagon_id: int, seat_id: int
+    ) -> Tuple[Optional[Train], Optional[Wagon], Optional[Seat]]:
+        """Поезд, вагон и место одним запросом.
+
+        Строки независимы, поэтому вместо трёх последовательных SELECT
+        все три цепляются LEFT JOIN'ами к фиктивной строке SELECT 1 —
+        один round trip, отсутствующие объекты приходят как None.
+        """
+        base = select(literal(1).label("one")).subquery()
+        row = (
+            await self.session.execute(
+                select(Train, Wagon, Seat)
+                .select_from(base)
+                .outerjoin(Train, Train.id == train_id)
+                .outerjoin(Wagon, Wagon.id == wagon_id)
+                .outerjoin(Seat, Seat.id == seat_id)
+            )
+        ).first()
+        if row is None:
+            return None, None, None
+        return row[0], row[1], row[2]
+
+    async def get_tickets_by_owner(self, owner_id: int, with_relations: bool = False) -> List[Ticket]:
+        """Билеты пользователя по owner_id — без обращения к таблице users.
+
+        with_relations догружает поезд/вагон/место тремя selectinload
+        (4 запроса на весь список вместо 1 + 3 на каждый билет).
+        """
+        query = select(Ticket).where(Ticket.owner_id == owner_id).order_by(Ticket.created_at.desc())
+        if with_relations:
+            query = query.options(
+                selectinload(Ticket.train),
+                selectinload(Ticket.wagon),
+                selectinload(Ticket.seat),
+            )
+        result = await self.session.execute(query)
+        return result.scalars().all()
+
+    async def get_user_tickets_with_owner(
+        self, user_id: int
+    ) -> Tuple[Optional[str], List[Ticket]]:
+        """Email пользователя и все его билеты одним запросом.
+
+        Возвращает (None, []) если пользователя нет.
+        """
+        result = await self.session.execute(
+            select(UserModel.email, Ticket)
+            .select_from(UserModel)
+            .outerjoin(Ticket, Ticket.passenger_email == UserModel.email)
+            .where(UserModel.id == user_id)
+            .order_by(Ticket.created_at.desc())
+        )
+        rows = result.all()
+        if not rows:
+            return None, []
+        email = rows[0][0]
+        return email, [row[1] for row in rows if row[1] is not None]
+
     async def get_user_tickets(self, passenger_email: str) -> List[Ticket]:
         result = await self.session.execute(
             select(Ticket).where(Ticket.passenger_email == passenger_email).order_by(Ticket.created_at.desc())
@@ -175,7 +413,7 @@ class TicketRepository:
     async def get_all_tickets(self) -> List[Ticket]:
         result = await self.session.execute(select(Ticket))
         return result.scalars().all()
-    
+
     async def update_ticket_payment(self, ticket_id: int, is_paid: bool) -> Ticket:
         ticket = await self.get_ticket(ticket_id)
         if ticket:
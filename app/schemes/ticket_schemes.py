@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 from datetime import datetime
 from typing import Optional, List
 from enum import Enum
@@ -42,9 +42,8 @@ class TrainResponse(TrainBase):
     id: int
     is_active: bool
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 class WagonBase(BaseModel):
     wagon_number: int = Field(gt=0)
@@ -59,9 +58,8 @@ class WagonResponse(WagonBase):
     id: int
     train_id: int
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 class SeatBase(BaseModel):
     seat_number: int
@@ -72,9 +70,8 @@ class SeatResponse(SeatBase):
     id: int
     wagon_id: int
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 class WagonWithSeatsResponse(WagonResponse):
     seats: List[SeatResponse] = []
@@ -116,9 +113,8 @@ class TicketResponse(TicketBase):
     created_at: datetime
     departure_time: datetime
     arrival_time: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 class TicketDetailResponse(TicketResponse):
     train_number: str
@@ -1,4 +1,6 @@
+import time
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 
 from app.config import settings
 from app.exceptions.auth import (
@@ -19,6 +21,20 @@ from app.services.base import BaseService
 import jwt
 from passlib.context import CryptContext
 
+# Константы подписи считаются один раз, а не на каждый запрос
+_SECRET_KEY = settings.SECRET_KEY
+_ALGORITHMS = [settings.ALGORITHM]
+
+
+# Кэш расшифровки: один и тот же токен приходит с каждым запросом
+# пользователя, повторять HMAC+base64 незачем. Ключ включает номер
+# минуты, поэтому истечение токена проверяется заново не реже раза
+# в минуту; невалидные токены не кэшируются (исключения lru_cache
+# не запоминает)
+@lru_cache(maxsize=4096)
+def _decode_token_cached(token: str, _minute: int) -> dict:
+    return jwt.decode(token, _SECRET_KEY, _ALGORITHMS)
+
 
 class AuthService(BaseService):
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -44,7 +60,7 @@ class AuthService(BaseService):
     @classmethod
     def decode_token(cls, token: str) -> dict:
         try:
-            return jwt.decode(token, settings.SECRET_KEY, [settings.ALGORITHM])
+            return _decode_token_cached(token, int(time.time() // 60))
         except jwt.exceptions.DecodeError as ex:
             raise InvalidJWTTokenError from ex
         except jwt.exceptions.ExpiredSignatureError as ex:
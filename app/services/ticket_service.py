@@ -1,67 +1,122 @@
-import uuid
+import secrets
+import time
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional, Tuple
+
+from cachetools import TTLCache
 from app.repositories.ticket_repository import TrainRepository, WagonRepository, SeatRepository, TicketRepository
 from app.models.tickets import Train, Wagon, Seat, Ticket, DiscountType
 from app.schemes.ticket_schemes import (
     TrainCreate, WagonCreate, PriceCalculationRequest, PriceCalculationResponse, TicketCreate
 )
 
+# Плоские справочники на уровне модуля: расчёт цены сводится к одному
+# обращению к dict без цепочки вызовов методов. Str-enum'ы хэшируются
+# как свои строковые значения, поэтому ключом годится и enum, и str
+_DISCOUNT_PCT = {
+    "child": 0.50,      # 50% скидка для детей (0-12 лет)
+    "student": 0.25,    # 25% скидка для студентов
+    "pensioner": 0.40,  # 40% скидка для пенсионеров
+    "none": 0.0         # Нет скидки
+}
+
+_WAGON_MULTIPLIER = {
+    "platzkart": 1.0,   # Плацкарт - базовая цена
+    "coupe": 1.5,       # Купе - 1.5x цена
+    "suite": 2.0        # Люкс - 2x цена
+}
+
+# Датная часть номера билета: strftime выполняется один раз в сутки,
+# ключ кэша — номер дня, поэтому смена даты сама вытесняет старое значение
+@lru_cache(maxsize=1)
+def _ticket_date_prefix(day_ordinal: int) -> str:
+    return datetime.utcfromtimestamp(day_ordinal * 86400).strftime('%Y%m%d')
+
+
+# Производные от _DISCOUNT_PCT, посчитанные один раз: итоговый множитель
+# цены и процент скидки в пользовательском виде (x100)
+_FINAL_MULTIPLIER = {k: 1.0 - v for k, v in _DISCOUNT_PCT.items()}
+_DISCOUNT_PERCENT_X100 = {k: v * 100 for k, v in _DISCOUNT_PCT.items()}
+
+
 class DiscountService:
     """Сервис для расчета скидок"""
-    
-    DISCOUNT_RATES = {
-        "child": 0.50,      # 50% скидка для детей (0-12 лет)
-        "student": 0.25,    # 25% скидка для студентов
-        "pensioner": 0.40,  # 40% скидка для пенсионеров
-        "none": 0.0         # Нет скидки
-    }
-    
+
+    DISCOUNT_RATES = _DISCOUNT_PCT
+    FINAL_MULTIPLIER = _FINAL_MULTIPLIER
+
     @staticmethod
     def get_discount_percent(discount_type: str) -> float:
         """Получить процент скидки по типу"""
-        return DiscountService.DISCOUNT_RATES.get(discount_type, 0.0)
-    
+        return _DISCOUNT_PCT.get(discount_type, 0.0)
+
     @staticmethod
     def calculate_final_price(base_price: float, discount_type: str) -> Tuple[float, float]:
         """Рассчитать финальную цену с учетом скидки"""
-        discount_percent = DiscountService.get_discount_percent(discount_type)
-        discount_amount = base_price * discount_percent
-        final_price = base_price - discount_amount
-        return final_price, discount_percent * 100
+        return (
+            base_price * _FINAL_MULTIPLIER.get(discount_type, 1.0),
+            _DISCOUNT_PERCENT_X100.get(discount_type, 0.0),
+        )
+
+# Кэш горячих поездов на процесс: справочные данные, которые читаются
+# при каждом показе и расчёте цены, но меняются редко. TTL ограничивает
+# устаревание, инвалидация — при создании/изменении поезда
+_TRAIN_CACHE: TTLCache = TTLCache(maxsize=512, ttl=60)
+
 
 class TrainService:
     """Сервис для управления поездами"""
-    
+
     def __init__(self, train_repo: TrainRepository):
         self.train_repo = train_repo
-    
+
     async def create_train(self, train_data: TrainCreate) -> Train:
         """Создать новый поезд"""
         train = Train(**train_data.model_dump())
-        return await self.train_repo.create_train(train)
+        train = await self.train_repo.create_train(train)
+        _TRAIN_CACHE.pop(train.id, None)
+        return train
     
     async def search_trains(self, route_from: str, route_to: str) -> List[Train]:
         """Поиск поездов по маршруту"""
         return await self.train_repo.search_trains(route_from, route_to)
+
+    async def search_trains_with_availability(self, route_from: str, route_to: str) -> List[Train]:
+        """Поиск поездов с вагонами и числом свободных мест (available_seats_count)"""
+        return await self.train_repo.search_with_availability(route_from, route_to)
     
     async def get_train(self, train_id: int) -> Optional[Train]:
         """Получить информацию о поезде"""
         return await self.train_repo.get_train(train_id)
+
+    async def get_train_cached(self, train_id: int) -> Optional[dict]:
+        """Получить поезд из process-кэша как Core-маппинг.
+
+        Горячие поезда отдаются без запроса к БД. Кэшируются простые
+        значения колонок, а не ORM-объект: тот привязан к сессии запроса
+        и протухает после её закрытия.
+        """
+        row = _TRAIN_CACHE.get(train_id)
+        if row is None:
+            row = await self.train_repo.get_train_row(train_id)
+            if row is not None:
+                _TRAIN_CACHE[train_id] = row
+        return row
     
     async def get_all_trains(self) -> List[Train]:
         """Получить все активные поезда"""
         return await self.train_repo.get_all_trains()
 
+    async def get_all_trains_rows(self) -> List[dict]:
+        """Получить все поезда как строки без ORM-объектов (для сериализации)"""
+        return await self.train_repo.get_all_trains_rows()
+
 class WagonService:
     """Сервис для управления вагонами"""
-    
-    WAGON_TYPE_MULTIPLIERS = {
-        "platzkart": 1.0,   # Плацкарт - базовая цена
-        "coupe": 1.5,       # Купе - 1.5x цена
-        "suite": 2.0        # Люкс - 2x цена
-    }
-    
+
+    WAGON_TYPE_MULTIPLIERS = _WAGON_MULTIPLIER
+
     def __init__(self, wagon_repo: WagonRepository, seat_repo: SeatRepository):
         self.wagon_repo = wagon_repo
         self.seat_repo = seat_repo
@@ -70,6 +125,11 @@ class WagonService:
         """Создать новый вагон"""
         wagon = Wagon(**wagon_data.model_dump())
         return await self.wagon_repo.create_wagon(wagon)
+
+    async def create_wagons_batch(self, wagons_data: List[WagonCreate]) -> List[Wagon]:
+        """Создать несколько вагонов с местами одной транзакцией"""
+        wagons = [Wagon(**wagon_data.model_dump()) for wagon_data in wagons_data]
+        return await self.wagon_repo.create_wagons_with_seats(wagons)
     
     async def get_wagon(self, wagon_id: int) -> Optional[Wagon]:
         """Получить информацию о вагоне"""
@@ -85,7 +145,7 @@ class WagonService:
     
     def get_price_multiplier(self, wagon_type: str) -> float:
         """Получить множитель цены для типа вагона"""
-        return self.WAGON_TYPE_MULTIPLIERS.get(wagon_type, 1.0)
+        return _WAGON_MULTIPLIER.get(wagon_type, 1.0)
 
 class SeatService:
     """Сервис для управления местами"""
@@ -93,17 +153,9 @@ class SeatService:
     def __init__(self, seat_repo: SeatRepository):
         self.seat_repo = seat_repo
     
-    async def create_seats(self, wagon_id: int, total_seats: int) -> List[Seat]:
-        """Создать места для вагона"""
-        seats = []
-        for seat_number in range(1, total_seats + 1):
-            seat = Seat(wagon_id=wagon_id, seat_number=seat_number)
-            seats.append(seat)
-        
-        for seat in seats:
-            await self.seat_repo.create_seat(seat)
-        
-        return seats
+    async def create_seats(self, wagon_id: int, total_seats: int) -> None:
+        """Создать места для вагона одним INSERT"""
+        await self.seat_repo.create_seats_bulk(wagon_id, total_seats)
     
     async def get_seat(self, seat_id: int) -> Optional[Seat]:
         """Получить информацию о месте"""
@@ -112,16 +164,24 @@ class SeatService:
     async def get_available_seats(self, wagon_id: int) -> List[Seat]:
         """Получить свободные места в вагоне"""
         return await self.seat_repo.get_available_seats(wagon_id)
-    
+
+    async def get_available_seats_rows(self, wagon_id: int) -> List[dict]:
+        """Свободные места как строки без ORM-объектов (для сериализации)"""
+        return await self.seat_repo.get_available_seats_rows(wagon_id)
+
     async def get_wagon_layout(self, wagon_id: int) -> List[Seat]:
         """Получить всю схему мест вагона"""
         return await self.seat_repo.get_all_seats(wagon_id)
+
+    async def get_wagon_layout_rows(self, wagon_id: int) -> List[dict]:
+        """Схема мест как строки без ORM-объектов (для сериализации)"""
+        return await self.seat_repo.get_all_seats_rows(wagon_id)
     
-    async def reserve_seat(self, seat_id: int) -> Seat:
+    async def reserve_seat(self, seat_id: int) -> Optional[Seat]:
         """Зарезервировать место"""
         return await self.seat_repo.reserve_seat(seat_id)
     
-    async def release_seat(self, seat_id: int) -> Seat:
+    async def release_seat(self, seat_id: int) -> Optional[Seat]:
         """Освободить место (отменить резервацию)"""
         return await self.seat_repo.release_seat(seat_id)
 
@@ -130,9 +190,8 @@ class SeatService:
         return await self.seat_repo.try_reserve_seat(seat_id)
 
     async def count_available_seats(self, wagon_id: int) -> int:
-        """Подсчитать количество свободных мест"""
-        available = await self.get_available_seats(wagon_id)
-        return len(available)
+        """Подсчитать количество свободных мест (COUNT(*) на стороне БД)"""
+        return await self.seat_repo.count_available(wagon_id)
 
 class TicketService:
     """Сервис для управления билетами"""
@@ -142,12 +201,24 @@ class TicketService:
         self.seat_repo = seat_repo
     
     def _generate_ticket_number(self) -> str:
-        """Сгенерировать номер билета"""
-        return f"WM-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
+        """Сгенерировать номер билета.
+
+        token_hex(4) — одно чтение 4 байт энтропии без построения UUID,
+        32 бита на билет в сутки достаточно от коллизий (уникальность
+        дополнительно страхует unique-индекс по ticket_number).
+        """
+        date_part = _ticket_date_prefix(int(time.time() // 86400))
+        return f"WM-{date_part}-{secrets.token_hex(4).upper()}"
     
-    async def calculate_price(self, 
-                            train: Train, 
-                            wagon: Wagon, 
+    async def get_booking_context(
+        self, train_id: int, wagon_id: int, seat_id: int
+    ) -> Tuple[Optional[Train], Optional[Wagon], Optional[Seat]]:
+        """Получить поезд, вагон и место для бронирования одним запросом"""
+        return await self.ticket_repo.get_train_wagon_seat(train_id, wagon_id, seat_id)
+
+    async def calculate_price(self,
+                            train: Train,
+                            wagon: Wagon,
                             discount_type: str = "none") -> PriceCalculationResponse:
         """Рассчитать стоимость билета"""
         base_price = train.base_price * wagon.price_multiplier
@@ -160,27 +231,28 @@ class TicketService:
             discount_type=discount_type
         )
     
-    async def create_ticket(self,
-                          ticket_data: TicketCreate,
-                          base_price: float,
-                          final_price: float,
-                          train: Train) -> Ticket:
-        """Создать билет и зарезервировать место"""
-        # Получаем значение discount_type (может быть enum или str)
-        discount_type_value = ticket_data.discount_type.value if hasattr(ticket_data.discount_type, 'value') else ticket_data.discount_type
-
-        # Рассчитать скидку
-        _, discount_percent = DiscountService.calculate_final_price(base_price, discount_type_value)
-        
-        # Создать билет
+    async def reserve_and_create_ticket(self,
+                                        ticket_data: TicketCreate,
+                                        base_price: float,
+                                        final_price: float,
+                                        discount_percent: float,
+                                        train: Train,
+                                        owner_id: int) -> Optional[Ticket]:
+        """Зарезервировать место и создать билет одной транзакцией.
+
+        Возвращает None, если место уже занято (условный UPDATE не затронул
+        ни одной строки) — компенсирующий release_seat не нужен.
+        Скидка приходит готовой из расчёта цены — второй раз не считаем.
+        """
         ticket = Ticket(
             train_id=ticket_data.train_id,
             wagon_id=ticket_data.wagon_id,
             seat_id=ticket_data.seat_id,
+            owner_id=owner_id,
             passenger_name=ticket_data.passenger_name,
             passenger_email=ticket_data.passenger_email,
             passenger_phone=ticket_data.passenger_phone,
-            discount_type=discount_type_value,
+            discount_type=ticket_data.discount_type,
             discount_percent=discount_percent,
             base_price=base_price,
             final_price=final_price,
@@ -190,16 +262,25 @@ class TicketService:
             is_paid=False
         )
 
-        # Сохранить билет (место уже зарезервировано через try_reserve_seat в API)
-        return await self.ticket_repo.create_ticket(ticket)
-    
-    async def get_ticket(self, ticket_id: int) -> Optional[Ticket]:
+        return await self.ticket_repo.reserve_and_create(ticket)
+
+    async def get_ticket(self, ticket_id: int, with_relations: bool = False) -> Optional[Ticket]:
         """Получить информацию о билете"""
-        return await self.ticket_repo.get_ticket(ticket_id)
-    
+        return await self.ticket_repo.get_ticket(ticket_id, with_relations=with_relations)
+
+    async def get_tickets_by_owner(self, owner_id: int, with_relations: bool = False) -> List[Ticket]:
+        """Получить билеты пользователя по owner_id без обращения к users"""
+        return await self.ticket_repo.get_tickets_by_owner(owner_id, with_relations=with_relations)
+
     async def get_user_tickets(self, passenger_email: str) -> List[Ticket]:
         """Получить все билеты пассажира"""
         return await self.ticket_repo.get_user_tickets(passenger_email)
+
+    async def get_user_tickets_with_owner(
+        self, user_id: int
+    ) -> Tuple[Optional[str], List[Ticket]]:
+        """Получить email пользователя и его билеты одним запросом"""
+        return await self.ticket_repo.get_user_tickets_with_owner(user_id)
     
     async def delete_ticket(self, ticket_id: int) -> bool:
         """Удалить билет"""
@@ -0,0 +1,59 @@
+"""Кэширование интроспекции зависимостей FastAPI.
+
+FastAPI при построении каждого маршрута прогоняет его callables через
+inspect.signature и проверки coroutine/generator. Для приложения с большим
+количеством Depends (create_ticket использует несколько сервис-фабрик)
+одни и те же функции-зависимости интроспектируются многократно.
+Здесь результаты кэшируются по самому callable.
+"""
+
+import functools
+from weakref import WeakKeyDictionary
+
+
+def _cache_predicate(fn):
+    """lru_cache с откатом на прямой вызов для нехэшируемых callables"""
+    cached = functools.lru_cache(maxsize=1024)(fn)
+
+    @functools.wraps(fn)
+    def wrapper(call):
+        try:
+            return cached(call)
+        except TypeError:
+            return fn(call)
+
+    return wrapper
+
+
+def apply_dependency_introspection_cache() -> None:
+    """Применить кэш интроспекции. Вызывается один раз при старте приложения."""
+    from fastapi.dependencies import utils as dep_utils
+
+    if getattr(dep_utils, "_introspection_cache_applied", False):
+        return
+
+    original_get_typed_signature = dep_utils.get_typed_signature
+    signature_cache: WeakKeyDictionary = WeakKeyDictionary()
+
+    @functools.wraps(original_get_typed_signature)
+    def cached_get_typed_signature(call):
+        try:
+            signature = signature_cache.get(call)
+        except TypeError:
+            return original_get_typed_signature(call)
+        if signature is None:
+            signature = original_get_typed_signature(call)
+            try:
+                signature_cache[call] = signature
+            except TypeError:
+                pass
+        return signature
+
+    dep_utils.get_typed_signature = cached_get_typed_signature
+
+    for name in ("is_coroutine_callable", "is_async_gen_callable", "is_gen_callable"):
+        predicate = getattr(dep_utils, name, None)
+        if predicate is not None:
+            setattr(dep_utils, name, _cache_predicate(predicate))
+
+    dep_utils._introspection_cache_applied = True
@@ -1,61 +1,60 @@
 """Скрипт для проверки содержимого БД"""
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy import select, func, inspect
 
 from app.config import settings
+# database импортируется до моделей: models -> database -> models
+# зацикливается, если входить в пакет со стороны моделей
+import app.database.database  # noqa: F401
 from app.models.tickets import Train, Wagon, Seat
 
 engine = create_async_engine(settings.get_db_url, echo=False)
-AsyncSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+# Сколько строк показываем в примерах — для диагностики хватает
+PREVIEW_LIMIT = 20
 
 async def check_db():
     """Проверить содержимое БД"""
-    
-    async with AsyncSessionLocal() as session:
-        # Проверяем поезда
-        result = await session.execute(select(Train))
-        trains = result.scalars().all()
-        
-        print(f"\n🚂 ПОЕЗДА В БД: {len(trains)}")
-        for train in trains:
+
+    # Все чтения — в одной транзакции на одном соединении:
+    # один BEGIN/COMMIT вместо пары на каждый SELECT
+    async with AsyncSessionLocal.begin() as session:
+        # Количество считаем агрегатом в SQL — строки в Python не тащим
+        counts = {}
+        for model in (Train, Wagon, Seat):
+            result = await session.execute(select(func.count()).select_from(model))
+            counts[model] = result.scalar_one()
+
+        print("\n🚂 ПОЕЗДА В БД:")
+        async for train in await session.stream_scalars(select(Train).limit(PREVIEW_LIMIT)):
             print(f"   ID: {train.id} | Номер: {train.train_number} | {train.route_from} → {train.route_to}")
-        
+        print(f"   Всего: {counts[Train]}")
+
         # Проверяем вагоны
-        result = await session.execute(select(Wagon))
-        wagons = result.scalars().all()
-        
-        print(f"\n🚪 ВАГОНЫ В БД: {len(wagons)}")
-        for wagon in wagons:
+        print("\n🚪 ВАГОНЫ В БД:")
+        async for wagon in await session.stream_scalars(select(Wagon).limit(PREVIEW_LIMIT)):
             print(f"   ID: {wagon.id} | Поезд: {wagon.train_id} | Тип: {wagon.wagon_type} | Мест: {wagon.total_seats}")
-        
-        # Проверяем места
-        result = await session.execute(select(Seat))
-        seats = result.scalars().all()
-        
-        print(f"\n🪑 МЕСТА В БД: {len(seats)}")
-        
-        # Проверяем структуру таблиц
-        print("\n📋 СТРУКТУРА ТАБЛИЦ:")
-        
-        try:
-            # Информация о таблице trains
-            result = await session.execute(text("PRAGMA table_info(train);"))
-            rows = result.fetchall()
-            if rows:
-                print("\n   Таблица 'train':")
-                for row in rows:
-                    print(f"      {row}")
-        except:
-            pass
-        
-        if not trains and not wagons and not seats:
-            print("\n❌ БД ПУСТА! Нужно запустить init_db.py")
-        else:
-            print(f"\n✅ БД содержит данные")
+        print(f"   Всего: {counts[Wagon]}")
+
+        print(f"\n🪑 МЕСТА В БД: {counts[Seat]}")
+
+    # Проверяем структуру таблиц через Inspector — работает на любом бэкенде
+    print("\n📋 СТРУКТУРА ТАБЛИЦ:")
+    async with engine.connect() as conn:
+        for table_name in (Train.__tablename__, Wagon.__tablename__, Seat.__tablename__):
+            columns = await conn.run_sync(
+                lambda sync_conn, name=table_name: inspect(sync_conn).get_columns(name)
+            )
+            print(f"\n   Таблица '{table_name}':")
+            for column in columns:
+                print(f"      {column['name']}: {column['type']}")
+
+    if not any(counts.values()):
+        print("\n❌ БД ПУСТА! Нужно запустить init_db.py")
+    else:
+        print(f"\n✅ БД содержит данные")
 
 async def main():
     try:
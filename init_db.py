@@ -1,8 +1,7 @@
 """Скрипт для инициализации БД с тестовыми данными"""
 import asyncio
 from datetime import datetime, timedelta
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy import select
 
 from app.config import settings
@@ -11,9 +10,7 @@ from app.models.tickets import Train, Wagon, Seat
 
 # Создание engine и session
 engine = create_async_engine(settings.get_db_url, echo=False)
-AsyncSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 async def init_db():
     """Инициализировать БД с тестовыми данными"""
@@ -22,11 +19,13 @@ async def init_db():
         await conn.run_sync(Base.metadata.create_all)
         print("✅ Таблицы созданы")
     
-    async with AsyncSessionLocal() as session:
+    # Одна транзакция на весь посев: begin() сам коммитит на выходе,
+    # промежуточных BEGIN/COMMIT между пачками нет
+    async with AsyncSessionLocal.begin() as session:
         # Проверяем, есть ли уже поезда
         result = await session.execute(select(Train))
         existing_trains = result.scalars().all()
-        
+
         if existing_trains:
             print(f"ℹ️  В БД уже есть {len(existing_trains)} поездов. Пропускаем инициализацию.")
             return
@@ -74,12 +73,8 @@ async def init_db():
             }
         ]
         
-        trains = []
-        for data in trains_data:
-            train = Train(**data)
-            session.add(train)
-            trains.append(train)
-        
+        trains = [Train(**data) for data in trains_data]
+        session.add_all(trains)
         await session.flush()  # Получить ID
         print(f"✅ добавлено {len(trains)} поездов")
         
@@ -91,33 +86,38 @@ async def init_db():
             {"type": "suite", "seats": 18, "number": 3}
         ]
         
-        wagon_count = 0
-        for train in trains:
-            for config in wagon_configs:
-                wagon = Wagon(
+        wagons = [
+            (
+                Wagon(
                     train_id=train.id,
                     wagon_type=config["type"],
                     wagon_number=config["number"],
                     total_seats=config["seats"]
-                )
-                session.add(wagon)
-                wagon_count += 1
-                await session.flush()
-                
-                # Создаём места для вагона
-                for seat_num in range(1, config["seats"] + 1):
-                    seat = Seat(
-                        wagon_id=wagon.id,
-                        seat_number=seat_num,
-                        is_reserved=False,
-                        is_available=True
-                    )
-                    session.add(seat)
-        
-        await session.flush()
+                ),
+                config["seats"]
+            )
+            for train in trains
+            for config in wagon_configs
+        ]
+        session.add_all(wagon for wagon, _ in wagons)
+        await session.flush()  # Один flush на все вагоны — получить ID
+
+        # Места всех вагонов одной пачкой
+        session.add_all(
+            Seat(
+                wagon_id=wagon.id,
+                seat_number=seat_num,
+                is_reserved=False,
+                is_available=True
+            )
+            for wagon, seats in wagons
+            for seat_num in range(1, seats + 1)
+        )
+
+        wagon_count = len(wagons)
         print(f"✅ добавлено {wagon_count} вагонов")
-        
-        await session.commit()
+
+        # Коммит сделает begin() при выходе из блока
         print("\n🎉 Инициализация успешно завершена!")
         print("\n📊 Статистика:")
         print(f"   - Поезда: {len(trains)}")
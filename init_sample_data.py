@@ -1,41 +1,49 @@
 import asyncio
-import httpx
+import aiohttp
 from datetime import datetime, timedelta
 
 BASE_URL = "http://127.0.0.1:8000/api/tickets"
 
-trains_data = [
-    {
-        "train_number": "РЖД-001",
-        "route_from": "Москва",
-        "route_to": "Санкт-Петербург",
-        "departure_time": (datetime.utcnow() + timedelta(hours=2)).isoformat(),
-        "arrival_time": (datetime.utcnow() + timedelta(hours=6)).isoformat(),
-        "duration_hours": 4,
-        "base_price": 2500.0,
-        "is_active": True
-    },
-    {
-        "train_number": "РЖД-002",
-        "route_from": "Москва",
-        "route_to": "Санкт-Петербург",
-        "departure_time": (datetime.utcnow() + timedelta(hours=8)).isoformat(),
-        "arrival_time": (datetime.utcnow() + timedelta(hours=12)).isoformat(),
-        "duration_hours": 4,
-        "base_price": 2000.0,
-        "is_active": True
-    },
-    {
-        "train_number": "РЖД-003",
-        "route_from": "Санкт-Петербург",
-        "route_to": "Москва",
-        "departure_time": (datetime.utcnow() + timedelta(hours=4)).isoformat(),
-        "arrival_time": (datetime.utcnow() + timedelta(hours=8)).isoformat(),
-        "duration_hours": 4,
-        "base_price": 2300.0,
-        "is_active": True
-    }
-]
+# Ограничитель одновременных запросов: gather не должен вываливать на
+# сервер неограниченный веер соединений (в пару к limit_per_host коннектора)
+MAX_CONCURRENCY = 32
+
+def build_trains_data() -> list[dict]:
+    """Собрать тестовые поезда; времена считаются от одного "сейчас"
+    в момент посева, а не при импорте модуля"""
+    now = datetime.utcnow()
+    return [
+        {
+            "train_number": "РЖД-001",
+            "route_from": "Москва",
+            "route_to": "Санкт-Петербург",
+            "departure_time": (now + timedelta(hours=2)).isoformat(),
+            "arrival_time": (now + timedelta(hours=6)).isoformat(),
+            "duration_hours": 4,
+            "base_price": 2500.0,
+            "is_active": True
+        },
+        {
+            "train_number": "РЖД-002",
+            "route_from": "Москва",
+            "route_to": "Санкт-Петербург",
+            "departure_time": (now + timedelta(hours=8)).isoformat(),
+            "arrival_time": (now + timedelta(hours=12)).isoformat(),
+            "duration_hours": 4,
+            "base_price": 2000.0,
+            "is_active": True
+        },
+        {
+            "train_number": "РЖД-003",
+            "route_from": "Санкт-Петербург",
+            "route_to": "Москва",
+            "departure_time": (now + timedelta(hours=4)).isoformat(),
+            "arrival_time": (now + timedelta(hours=8)).isoformat(),
+            "duration_hours": 4,
+            "base_price": 2300.0,
+            "is_active": True
+        }
+    ]
 
 wagons_config = [
     {"wagon_type": "platzkart", "wagon_number": 1, "total_seats": 54, "price_multiplier": 1.0},
@@ -43,44 +51,54 @@ wagons_config = [
     {"wagon_type": "suite", "wagon_number": 3, "total_seats": 18, "price_multiplier": 2.0}
 ]
 
+async def create_train_with_wagons(session: aiohttp.ClientSession,
+                                   sem: asyncio.Semaphore, train_data: dict):
+    try:
+        print(f"\n🚂 Создаю поезд: {train_data['train_number']}")
+        async with sem:
+            async with session.post(f"{BASE_URL}/trains", json=train_data) as resp:
+                if resp.status != 200:
+                    print(f"❌ Ошибка: {resp.status}")
+                    print((await resp.text())[:300])
+                    return
+                train = await resp.json()
+
+        train_id = train.get('id')
+        print(f"✅ Поезд создан (ID: {train_id})")
+
+        # Все вагоны поезда — одним batch-запросом: один round trip
+        # и одна транзакция на сервере вместо трёх
+        batch = [{**wagon_cfg, "train_id": train_id} for wagon_cfg in wagons_config]
+        async with sem:
+            async with session.post(f"{BASE_URL}/wagons/batch", json=batch) as resp:
+                if resp.status != 200:
+                    print(f"  ❌ Ошибка вагонов: {resp.status}")
+                    return
+                wagons = await resp.json()
+        for wagon_cfg, wagon in zip(wagons_config, wagons):
+            print(f"  ✅ {wagon_cfg['wagon_type'].upper()}: {wagon_cfg['total_seats']} мест (ID: {wagon.get('id')})")
+    except Exception as e:
+        print(f"❌ Ошибка при создании поезда: {e}")
+
+
 async def create_trains():
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        for train_data in trains_data:
-            try:
-                print(f"\n🚂 Создаю поезд: {train_data['train_number']}")
-                resp = await client.post(f"{BASE_URL}/trains", json=train_data)
-                
-                if resp.status_code != 200:
-                    print(f"❌ Ошибка: {resp.status_code}")
-                    print(resp.text[:300])
-                    continue
-                
-                train = resp.json()
-                train_id = train.get('id')
-                print(f"✅ Поезд создан (ID: {train_id})")
-                
-                # Создаем вагоны
-                for wagon_cfg in wagons_config:
-                    wagon_data = {**wagon_cfg, "train_id": train_id}
-                    try:
-                        wagon_resp = await client.post(f"{BASE_URL}/wagons", json=wagon_data)
-                        if wagon_resp.status_code == 200:
-                            wagon = wagon_resp.json()
-                            print(f"  ✅ {wagon_cfg['wagon_type'].upper()}: {wagon_cfg['total_seats']} мест (ID: {wagon.get('id')})")
-                        else:
-                            print(f"  ❌ Ошибка вагона: {wagon_resp.status_code}")
-                    except Exception as e:
-                        print(f"  ❌ Ошибка: {e}")
-                        
-            except Exception as e:
-                print(f"❌ Ошибка при создании поезда: {e}")
+    # Одна сессия с пулом keep-alive-соединений на весь прогон; поезда
+    # независимы и создаются параллельно, вагоны — внутри каждого поезда
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit_per_host=MAX_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await asyncio.gather(*(
+            create_train_with_wagons(session, sem, train_data)
+            for train_data in build_trains_data()
+        ))
 
 async def main():
     print("\n" + "="*60)
     print("🚂 ИНИЦИАЛИЗАЦИЯ ТЕСТОВЫХ БИЛЕТОВ")
     print("="*60)
     print(f"\n📍 Подключаюсь к: {BASE_URL}\n")
-    
+
     try:
         await create_trains()
         print("\n" + "="*60)
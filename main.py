@@ -1,50 +1,61 @@
+import hashlib
+import os
 import uvicorn
 import logging
+import orjson
 from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
 from pathlib import Path
 from contextlib import asynccontextmanager
-from starlette.middleware.sessions import SessionMiddleware
+from app.admin.session import AdminSessionMiddleware
+
+from app.utils.fastapi_patches import apply_dependency_introspection_cache
+
+# Кэш интроспекции зависимостей должен быть установлен до импорта роутеров,
+# чтобы регистрация маршрутов уже шла через него
+apply_dependency_introspection_cache()
 
 from app.api.sample import router as sample_router
 from app.api.auth import router as auth_router
 from app.api.roles import router as role_router
 from app.api.tickets import router as tickets_router
-from app.database.database import Base, engine, async_session_maker
-from app.models.roles import RoleModel
-from sqlalchemy import select
+from app.database.database import engine
+from app.database.bootstrap import ensure_schema
 from app.services.auth import AuthService
 from app.exceptions.auth import InvalidJWTTokenError, JWTTokenExpiredError
 from app.config import settings
 
-# Логирование
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Логирование. В dev — подробный INFO-формат; в prod — WARNING и лаконичный
+# формат, а запись уходит через QueueHandler/QueueListener в отдельный поток,
+# чтобы форматирование и stderr-IO не блокировали event loop
+_log_level = (settings.LOG_LEVEL or ("WARNING" if settings.ENV == "prod" else "INFO")).upper()
+if settings.ENV == "prod":
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+
+    _log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _stream_handler = logging.StreamHandler()
+    _stream_handler.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+    logging.basicConfig(level=_log_level, handlers=[QueueHandler(_log_queue)])
+    _log_listener = QueueListener(_log_queue, _stream_handler)
+    _log_listener.start()
+else:
+    logging.basicConfig(
+        level=_log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
 logger = logging.getLogger(__name__)
 
 # Жизненный цикл приложения
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup - создание таблиц при запуске
-    logger.info("🚀 Создание таблиц базы данных...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("✅ Таблицы успешно созданы")
-
-    # Создание ролей по умолчанию
-    async with async_session_maker() as session:
-        result = await session.execute(select(RoleModel))
-        existing_roles = result.scalars().all()
-        if not existing_roles:
-            logger.info("📋 Создание ролей по умолчанию...")
-            session.add(RoleModel(id=1, name="user"))
-            session.add(RoleModel(id=2, name="admin"))
-            session.add(RoleModel(id=3, name="moderator"))
-            await session.commit()
-            logger.info("✅ Роли созданы")
+    # Startup - создание таблиц и ролей по умолчанию. Инициализацию
+    # выполняет один воркер (файловая блокировка в bootstrap), остальные
+    # стартуют без DDL-обращений к БД
+    await ensure_schema()
 
     # Здесь выполняется основной код приложения
     yield
@@ -58,21 +69,55 @@ app = FastAPI(
     title="ВагоноМесто - Сервис покупки ж/д билетов",
     version="1.0.0",
     description="Онлайн платформа для бронирования железнодорожных билетов",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson сериализует JSON в нативном коде — дешевле стандартного
+    # json.dumps на каждый ответ API
+    default_response_class=ORJSONResponse
 )
 
-# Middleware
-from fastapi.middleware.cors import CORSMiddleware
+# Health check отвечает прямо из ASGI-слоя: liveness-пробы ходят сюда
+# каждые несколько секунд, и им незачем проходить CORS, сессию и роутинг
+_HEALTH_BODY = orjson.dumps({"status": "ok", "service": "wagono-mesto"})
+_HEALTH_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_HEALTH_BODY)).encode()),
+]
+
+
+class HealthShortcutMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/health":
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": _HEALTH_HEADERS})
+            await send({"type": "http.response.body", "body": _HEALTH_BODY})
+            return
+        await self.app(scope, receive, send)
 
+
+# Middleware. GZip добавляется первым — оказывается самым внутренним:
+# сжимается уже готовый ответ приложения, а мелкие (до 1КБ) ответы
+# не трогаются, чтобы не платить за deflate больше, чем экономим
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Конкретные списки вместо "*": middleware отдаёт статические
+# заголовки без echo исходного Origin, а preflight кэшируется браузером
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=settings.cors_origins_list,
     allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
 )
 
-app.add_middleware(SessionMiddleware, secret_key=settings.SESSION_SECRET)
+# Сессия нужна только админке — остальные запросы не платят за cookie
+app.add_middleware(AdminSessionMiddleware, secret_key=settings.SESSION_SECRET)
+
+# Добавляется последней — оказывается самой внешней в стеке
+app.add_middleware(HealthShortcutMiddleware)
 
 # Аутентификация реализована через dependencies в tickets.py
 # Публичные маршруты не требуют токена, защищённые используют CurrentUserDep
@@ -83,129 +128,92 @@ app.include_router(auth_router)
 app.include_router(role_router)
 app.include_router(tickets_router)
 
-# Статические файлы
+# Статические файлы. Сессию они уже не оплачивают (AdminSessionMiddleware
+# пропускает всё вне /admin), а долгий Cache-Control позволяет браузеру
+# вообще не ходить за js/css повторно
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles с Cache-Control: ревалидация по ETag остаётся,
+    но свежий ответ браузер держит в кэше сутки"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=86400"
+        return response
+
+
 static_dir = Path(__file__).parent / "app" / "static"
 if static_dir.exists():
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    app.mount("/static", CachedStaticFiles(directory=static_dir), name="static")
     logger.info(f"✅ Статические файлы найдены в {static_dir}")
 else:
     logger.warning(f"⚠️ Директория статических файлов не найдена: {static_dir}")
 
-# SQLAdmin с аутентификацией
-try:
-    from sqladmin import Admin, ModelView
-    from sqladmin.authentication import AuthenticationBackend
-    from starlette.requests import Request as StarletteRequest
-    from starlette.responses import RedirectResponse
-    from app.models.users import UserModel
-    from app.models.tickets import Train, Wagon, Seat, Ticket
-    from app.models.roles import RoleModel
-
-    # Аутентификация для админ-панели
-    class AdminAuth(AuthenticationBackend):
-        async def login(self, request: StarletteRequest) -> bool:
-            form = await request.form()
-            username = form.get("username")
-            password = form.get("password")
-
-            # Проверяем логин/пароль из конфига
-            if username == settings.ADMIN_USERNAME and password == settings.ADMIN_PASSWORD:
-                request.session.update({"admin_authenticated": True})
-                return True
-            return False
-
-        async def logout(self, request: StarletteRequest) -> bool:
-            request.session.clear()
-            return True
-
-        async def authenticate(self, request: StarletteRequest) -> bool:
-            return request.session.get("admin_authenticated", False)
-
-    # SQLAdmin ModelViews
-    class UserAdmin(ModelView, model=UserModel):
-        name = "Пользователь"
-        name_plural = "Пользователи"
-        column_exclude_list = [UserModel.hashed_password]
-        page_size = 10
-        page_size_options = [10, 25, 50]
-
-    class TrainAdmin(ModelView, model=Train):
-        name = "Поезд"
-        name_plural = "Поезда"
-        page_size = 10
-        page_size_options = [10, 25, 50]
-        can_delete = False
-
-    class WagonAdmin(ModelView, model=Wagon):
-        name = "Вагон"
-        name_plural = "Вагоны"
-        page_size = 10
-        page_size_options = [10, 25, 50]
-
-    class SeatAdmin(ModelView, model=Seat):
-        name = "Место"
-        name_plural = "Места"
-        page_size = 20
-        page_size_options = [10, 20, 50]
-
-    class TicketAdmin(ModelView, model=Ticket):
-        name = "Билет"
-        name_plural = "Билеты"
-        page_size = 10
-        page_size_options = [10, 25, 50]
-        column_exclude_list = []
-
-    class RoleAdmin(ModelView, model=RoleModel):
-        name = "Роль"
-        name_plural = "Роли"
-        page_size = 10
-        page_size_options = [10, 25, 50]
-
-    # Регистрация SQLAdmin С аутентификацией
-    authentication_backend = AdminAuth(secret_key=settings.SESSION_SECRET)
-    admin = Admin(
-        app=app,
-        engine=engine,
-        title="Админ Панель - ВагоноМесто",
-        logo_url="https://cdn-icons-png.flaticon.com/512/4641/4641073.png",
-        authentication_backend=authentication_backend
-    )
-
-    admin.add_view(UserAdmin)
-    admin.add_view(TrainAdmin)
-    admin.add_view(WagonAdmin)
-    admin.add_view(SeatAdmin)
-    admin.add_view(TicketAdmin)
-    admin.add_view(RoleAdmin)
-
-    logger.info("✅ SQLAdmin зарегистрирован на /admin")
-    logger.info("🔐 Админ панель защищена паролем (логин: admin)")
-
-except Exception as e:
-    logger.error(f"❌ Ошибка SQLAdmin: {e}")
-    import traceback
-    traceback.print_exc()
-
-# Главная страница - всегда возвращает index.html (фронтенд сам будет проверять токен)
-@app.get("/")
-async def root():
-    html_file = static_dir / "index.html"
-    if html_file.exists():
-        return FileResponse(html_file)
-    return {"message": "Добро пожаловать в ВагоноМесто!"}
-
-# Health check
-@app.get("/health")
-async def health():
-    return {"status": "ok", "service": "wagono-mesto"}
+# SQLAdmin с аутентификацией (выключается в API-only деплоях)
+if settings.ENABLE_ADMIN:
+    try:
+        from app.admin.views import register_admin
+
+        register_admin(app, engine)
+    except Exception:
+        # logger.exception пишет traceback одной записью через хендлер
+        # (в prod — через очередь), а не сырым print_exc в stdout
+        logger.exception("❌ Ошибка SQLAdmin")
+
+# Главная страница: index.html читается в память один раз — на каждый
+# хит "/" не тратятся open()+stat(). ETag считается от содержимого,
+# no-cache заставляет браузер ревалидировать (и получать дешёвый 304)
+_index_file = static_dir / "index.html"
+if _index_file.exists():
+    _INDEX_BODY = _index_file.read_bytes()
+    _INDEX_ETAG = f'"{hashlib.md5(_INDEX_BODY).hexdigest()}"'
+    _INDEX_HEADERS = {"ETag": _INDEX_ETAG, "Cache-Control": "no-cache"}
+
+    @app.get("/", include_in_schema=False)
+    async def index(request: Request):
+        if request.headers.get("if-none-match") == _INDEX_ETAG:
+            return Response(status_code=304, headers=_INDEX_HEADERS)
+        return Response(_INDEX_BODY, media_type="text/html", headers=_INDEX_HEADERS)
+
+# Остальные пути, не разобранные роутерами выше, уходят в StaticFiles
+# (mount идёт последним, поэтому срабатывает только на непойманное)
+if static_dir.exists():
+    app.mount("/", StaticFiles(directory=static_dir, html=True), name="root")
 
 if __name__ == "__main__":
     logger.info("🚂 Запуск сервера ВагоноМесто...")
-    # reload=True требует указания модуля как строки, иначе кеширует старый код
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+    # uvloop и httptools (uvicorn[standard]) заметно быстрее стандартного
+    # цикла и парсера; guard оставлен для платформ без uvloop (Windows)
+    try:
+        import uvloop  # noqa: F401
+        loop_impl, http_impl = "uvloop", "httptools"
+    except ImportError:
+        loop_impl, http_impl = "auto", "auto"
+
+    if settings.ENV == "prod":
+        # Прод: по воркеру на ядро с запасом, без reload —
+        # один event loop упирается в одно ядро. WEB_CONCURRENCY
+        # (стандартная переменная gunicorn/heroku) переопределяет расчёт
+        workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=workers,
+            loop=loop_impl,
+            http=http_impl,
+            log_level="warning",
+            # access-лог пишет строку на каждый запрос — в проде это
+            # работа обратного прокси
+            access_log=False
+        )
+    else:
+        # reload=True требует указания модуля как строки, иначе кеширует старый код
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            loop=loop_impl,
+            http=http_impl,
+            log_level="info"
+        )
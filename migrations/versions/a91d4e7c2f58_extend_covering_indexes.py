@@ -0,0 +1,40 @@
+"""extend covering indexes for seats and tickets
+
+Revision ID: a91d4e7c2f58
+Revises: f3a92c5d7e61
+Create Date: 2026-08-30 15:41:22.904318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91d4e7c2f58'
+down_revision: Union[str, Sequence[str], None] = 'f3a92c5d7e61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # seat_number в хвосте индекса делает его покрывающим:
+    # фильтр и сортировка выборки свободных мест идут по индексу
+    op.drop_index('ix_seats_wagon_avail', table_name='seats')
+    op.create_index(
+        'ix_seats_wagon_avail', 'seats',
+        ['wagon_id', 'is_available', 'is_reserved', 'seat_number']
+    )
+    # created_at в индексе по email покрывает ORDER BY билетов пассажира
+    op.drop_index('ix_tickets_email', table_name='tickets')
+    op.create_index('ix_tickets_email_created', 'tickets', ['passenger_email', 'created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tickets_email_created', table_name='tickets')
+    op.create_index('ix_tickets_email', 'tickets', ['passenger_email'])
+    op.drop_index('ix_seats_wagon_avail', table_name='seats')
+    op.create_index('ix_seats_wagon_avail', 'seats', ['wagon_id', 'is_available', 'is_reserved'])
@@ -0,0 +1,37 @@
+"""add composite indexes for hot queries
+
+Revision ID: b7c41d20a8e3
+Revises: 8019d75e3d9f
+Create Date: 2026-08-30 12:14:05.731204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c41d20a8e3'
+down_revision: Union[str, Sequence[str], None] = '8019d75e3d9f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_trains_route_active', 'trains', ['route_from', 'route_to', 'is_active'])
+    op.create_index('ix_seats_wagon_avail', 'seats', ['wagon_id', 'is_available', 'is_reserved'])
+    op.create_index('ix_tickets_email', 'tickets', ['passenger_email'])
+    # Одноколоночные индексы по маршруту больше не нужны — их покрывает составной
+    op.drop_index('ix_trains_route_from', table_name='trains')
+    op.drop_index('ix_trains_route_to', table_name='trains')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_trains_route_from', 'trains', ['route_from'])
+    op.create_index('ix_trains_route_to', 'trains', ['route_to'])
+    op.drop_index('ix_tickets_email', table_name='tickets')
+    op.drop_index('ix_seats_wagon_avail', table_name='seats')
+    op.drop_index('ix_trains_route_active', table_name='trains')
@@ -0,0 +1,40 @@
+"""add owner_id to tickets with email backfill
+
+Revision ID: f3a92c5d7e61
+Revises: b7c41d20a8e3
+Create Date: 2026-08-30 14:02:37.118492
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a92c5d7e61'
+down_revision: Union[str, Sequence[str], None] = 'b7c41d20a8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # batch-режим ради SQLite: ALTER TABLE ... ADD CONSTRAINT там не работает
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.add_column(sa.Column('owner_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_tickets_owner_id_users', 'users', ['owner_id'], ['id'])
+        batch_op.create_index('ix_tickets_owner_id', ['owner_id'])
+    # Бэкфилл: владельца старых билетов восстанавливаем по email
+    op.execute(
+        "UPDATE tickets SET owner_id = "
+        "(SELECT id FROM users WHERE users.email = tickets.passenger_email)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('tickets') as batch_op:
+        batch_op.drop_index('ix_tickets_owner_id')
+        batch_op.drop_constraint('fk_tickets_owner_id_users', type_='foreignkey')
+        batch_op.drop_column('owner_id')
@@ -2,9 +2,15 @@
 """Simple script to populate database with test trains"""
 import asyncio
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, text
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+# database импортируется первым (разруливает циклический импорт моделей),
+# роли/пользователи — чтобы настроились relationship'ы между мапперами
+import app.database.database  # noqa: F401
+from app.models.roles import RoleModel  # noqa: F401
+from app.models.users import UserModel  # noqa: F401
+from app.models.tickets import Train, Wagon
 
 # Если используете SQLite, можно автоматически найти DATABASE_URL
 try:
@@ -16,22 +22,71 @@ except:
 
 print(f"📋 Database URL: {DATABASE_URL}")
 
+# Мест по типам вагона; вагоны идут тройками platzkart, coupe, suite
+SEATS_PER_TYPE = (54, 36, 18)
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Число параллельных сессий для заливки мест на СУБД с настоящим
+# параллелизмом записи (PostgreSQL/MySQL); SQLite сериализует писателей
+SEAT_INSERT_TASKS = 4
+
+SEAT_INSERT_SQL = text(
+    "INSERT INTO seats (wagon_id, seat_number, is_reserved, is_available, created_at, updated_at) "
+    "VALUES (:wagon_id, :seat_number, :is_reserved, :is_available, :created_at, :updated_at)"
+)
+
+# Один движок на модуль: раньше второй create_async_engine внутри
+# populate() создавал лишний пул соединений, который никогда не закрывался.
+# Для клиент-серверных СУБД — небольшой пул с LIFO-выдачей (хватает на
+# параллельную заливку мест); SQLite остаётся на пуле по умолчанию
+_engine_kwargs: dict = {}
+if not IS_SQLITE:
+    _engine_kwargs = {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_use_lifo": True,
+        "pool_pre_ping": True,
+    }
+engine = create_async_engine(DATABASE_URL, echo=False, **_engine_kwargs)
+AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+async def _insert_seat_chunk(rows: list[dict]) -> None:
+    """Вставить свой кусок мест в отдельной сессии (для параллельной заливки)"""
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(SEAT_INSERT_SQL, rows)
+
+
 async def populate():
-    engine = create_async_engine(DATABASE_URL, echo=False)
-    
     async with AsyncSessionLocal() as session:
+        # PRAGMA до загрузки: WAL с synchronous=NORMAL убирает fsync на
+        # каждый statement (group commit), временные структуры и кэш
+        # страниц держим в памяти. journal_mode нельзя менять внутри
+        # транзакции, поэтому PRAGMAs идут до session.begin()
+        if IS_SQLITE:
+            for pragma in (
+                "PRAGMA journal_mode=WAL",
+                "PRAGMA synchronous=NORMAL",
+                "PRAGMA temp_store=MEMORY",
+                "PRAGMA cache_size=-200000",
+            ):
+                await session.execute(text(pragma))
+            await session.commit()
+
         # Проверяем таблицы
         try:
-            result = await session.execute(text("SELECT COUNT(*) FROM train"))
+            result = await session.execute(select(func.count()).select_from(Train))
             train_count = result.scalar()
             print(f"\n🚂 Поезда в БД: {train_count}")
-            
+
             if train_count > 0:
                 print("ℹ️  Данные уже есть, пропускаем")
                 return
         except Exception as e:
             print(f"ℹ️  Таблицы не существуют: {e}")
-        
+        await session.rollback()
+
         # Расширенный список поездов по России
         now = datetime.now()
         trains_data = [
@@ -90,94 +145,109 @@ async def populate():
             ('082К', 'Екатеринбург', 'Казань', 8, 22, 14, 3200),
         ]
         
-        # Формируем SQL для вставки поездов
-        trains_values = []
-        for train in trains_data:
-            number, from_city, to_city, dep_offset, arr_offset, duration, price = train
-            dep_time = now + timedelta(hours=dep_offset)
-            arr_time = now + timedelta(hours=arr_offset)
-            trains_values.append(
-                f"('{number}', '{from_city}', '{to_city}', '{dep_time}', '{arr_time}', {duration}, {price}, '{now}', '{now}')"
-            )
-        
-        trains_sql = f"""
-        INSERT INTO train (train_number, route_from, route_to, departure_time, arrival_time, duration_hours, base_price, created_at, updated_at)
-        VALUES {', '.join(trains_values)}
-        """
-        
-        try:
-            await session.execute(text(trains_sql))
-            await session.commit()
-            print(f"✅ Добавлено {len(trains_data)} поездов")
-        except Exception as e:
-            print(f"❌ Ошибка при добавлении поездов: {e}")
-            return
-        
-        # Добавляем вагоны для каждого поезда (3 типа вагонов на поезд)
-        wagon_values = []
-        wagon_id = 1
-        for train_id in range(1, len(trains_data) + 1):
-            # Плацкарт
-            wagon_values.append(f"({train_id}, 'platzkart', 1, 54, 1.0, '{now}', '{now}')")
-            # Купе
-            wagon_values.append(f"({train_id}, 'coupe', 2, 36, 1.5, '{now}', '{now}')")
-            # СВ (люкс)
-            wagon_values.append(f"({train_id}, 'suite', 3, 18, 2.0, '{now}', '{now}')")
-        
-        wagons_sql = f"""
-        INSERT INTO wagon (train_id, wagon_type, wagon_number, total_seats, price_multiplier, created_at, updated_at)
-        VALUES {', '.join(wagon_values)}
-        """
-        
+        # Вставляем поезда одним Core-insert со списком словарей:
+        # SQLAlchemy сам собирает multi-row INSERT с параметрами,
+        # без склейки значений f-строкой
+        trains_rows = [
+            {
+                "train_number": number,
+                "route_from": from_city,
+                "route_to": to_city,
+                "departure_time": now + timedelta(hours=dep_offset),
+                "arrival_time": now + timedelta(hours=arr_offset),
+                "duration_hours": duration,
+                "base_price": price,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for number, from_city, to_city, dep_offset, arr_offset, duration, price in trains_data
+        ]
+
+        # Места не зависят от БД (id вагонов идут подряд с 1 на пустой
+        # базе) — строки готовим заранее, до открытия транзакции
+        total_wagons = len(trains_data) * 3  # 3 вагона на поезд
+
+        def _seats_for(wagon_id: int) -> int:
+            return SEATS_PER_TYPE[(wagon_id - 1) % 3]
+
+        seat_rows = [
+            {
+                "wagon_id": wagon_id,
+                "seat_number": seat_num,
+                "is_reserved": 0,
+                "is_available": 1,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for wagon_id in range(1, total_wagons + 1)
+            for seat_num in range(1, _seats_for(wagon_id) + 1)
+        ]
+
+        # Вся загрузка — одна транзакция: один commit (и один fsync)
+        # на ~3 400 строк вместо коммита после каждого блока
         try:
-            await session.execute(text(wagons_sql))
-            await session.commit()
-            print(f"✅ Добавлено {len(wagon_values)} вагонов")
+            async with session.begin():
+                await session.execute(insert(Train), trains_rows)
+                print(f"✅ Добавлено {len(trains_data)} поездов")
+
+                # Реальные id поездов — для FK вагонов
+                result = await session.execute(select(Train.id).order_by(Train.id))
+                train_ids = result.scalars().all()
+
+                # Добавляем вагоны для каждого поезда (3 типа вагонов на поезд)
+                wagon_types = [
+                    ("platzkart", 1, 54, 1.0),  # Плацкарт
+                    ("coupe", 2, 36, 1.5),      # Купе
+                    ("suite", 3, 18, 2.0),      # СВ (люкс)
+                ]
+                wagons_rows = [
+                    {
+                        "train_id": train_id,
+                        "wagon_type": wagon_type,
+                        "wagon_number": wagon_number,
+                        "total_seats": total_seats,
+                        "price_multiplier": multiplier,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for train_id in train_ids
+                    for wagon_type, wagon_number, total_seats, multiplier in wagon_types
+                ]
+                await session.execute(insert(Wagon), wagons_rows)
+                print(f"✅ Добавлено {len(wagons_rows)} вагонов")
+
+                if IS_SQLITE:
+                    # SQLite сериализует писателей — места заливаются
+                    # здесь же, одним executemany в той же транзакции
+                    print("🪑 Добавляем места...")
+                    await session.execute(SEAT_INSERT_SQL, seat_rows)
+                    print("✅ Места добавлены")
         except Exception as e:
-            print(f"❌ Ошибка при добавлении вагонов: {e}")
+            print(f"❌ Ошибка при заполнении: {e}")
             return
-        
-        # Добавляем места для всех вагонов
-        print("🪑 Добавляем места...")
-        total_wagons = len(trains_data) * 3  # 3 вагона на поезд
-        
-        for wagon_id in range(1, total_wagons + 1):
-            # Определяем количество мест в зависимости от типа вагона
-            wagon_type_index = (wagon_id - 1) % 3
-            if wagon_type_index == 0:  # platzkart
-                total_seats = 54
-            elif wagon_type_index == 1:  # coupe
-                total_seats = 36
-            else:  # suite
-                total_seats = 18
-            
-            # Добавляем все места для вагона
-            seat_values = []
-            for seat_num in range(1, total_seats + 1):
-                seat_values.append(f"({wagon_id}, {seat_num}, 0, 1, '{now}', '{now}')")
-            
-            # Вставляем места пачками
-            if seat_values:
-                seats_sql = f"""
-                INSERT INTO seat (wagon_id, seat_number, is_reserved, is_available, created_at, updated_at)
-                VALUES {', '.join(seat_values)}
-                """
-                try:
-                    await session.execute(text(seats_sql))
-                except Exception as e:
-                    print(f"⚠️  Ошибка при добавлении мест для вагона {wagon_id}: {e}")
-        
-        await session.commit()
-        print("✅ Места добавлены")
-        
+
+        if not IS_SQLITE:
+            # PostgreSQL/MySQL умеют писать параллельно: места льются
+            # несколькими сессиями одновременно, каждая — свой кусок строк
+            print("🪑 Добавляем места...")
+            try:
+                chunk_size = -(-len(seat_rows) // SEAT_INSERT_TASKS)
+                async with asyncio.TaskGroup() as tg:
+                    for start in range(0, len(seat_rows), chunk_size):
+                        tg.create_task(
+                            _insert_seat_chunk(seat_rows[start:start + chunk_size])
+                        )
+            except ExceptionGroup as e:
+                print(f"❌ Ошибка при добавлении мест: {e.exceptions}")
+                return
+            print("✅ Места добавлены")
+
         print("\n🎉 База данных успешно заполнена!")
         print(f"📊 Всего поездов: {len(trains_data)}")
-        print(f"📊 Всего вагонов: {len(wagon_values)}")
-        print(f"📊 Всего мест: ~{len(trains_data) * (54 + 36 + 18)}")
+        print(f"📊 Всего вагонов: {len(wagons_rows)}")
+        print(f"📊 Всего мест: ~{len(trains_data) * sum(SEATS_PER_TYPE)}")
     
     await engine.dispose()
 
-AsyncSessionLocal = sessionmaker(create_async_engine(DATABASE_URL, echo=False), class_=AsyncSession, expire_on_commit=False)
-
 if __name__ == "__main__":
     asyncio.run(populate())